@@ -77,10 +77,8 @@ def render_system_settings_page(db, anpr_integration=None):
         if st.button("🔴 DISABLE ENTIRE SYSTEM", type="primary"):
             if disable_reason.strip():
                 # Stop ANPR monitoring if active
-                if anpr_integration and hasattr(st.session_state,
-                                                'monitoring_active') and st.session_state.monitoring_active:
+                if anpr_integration and anpr_integration.monitoring_active:
                     anpr_integration.stop_monitoring()
-                    st.session_state.monitoring_active = False
 
                 # Update system config
                 system_config.update({
@@ -255,10 +253,7 @@ def render_system_settings_page(db, anpr_integration=None):
 
     with col2:
         if st.button("🧹 Clear Reservation History"):
-            empty_df = pd.DataFrame(
-                columns=['id', 'spot_id', 'plate_number', 'customer_name', 'customer_email', 'customer_phone',
-                         'start_time', 'end_time', 'duration_minutes', 'status', 'created_at'])
-            empty_df.to_csv(db.reservations_file, index=False)
+            db.clear_reservations()
             st.success("🧼 Reservation history cleared.")
             st.rerun()
 
@@ -0,0 +1,347 @@
+#anpr_worker.py
+#BuiltWithLove by @papitx0
+"""Standalone ANPR process: owns the models and cameras, serves the web app over local IPC.
+
+    python anpr_worker.py [--data-dir parking_data] [--start entrance,exit] [--processes 3]
+
+The dashboard talks to it through WorkerClient. Commands (start/stop/add
+cameras, status, one-off images) are request/reply; detections are pushed
+to subscribed clients, which apply them to the parking database. Parking
+state stays in the web app process because the spot table is resident there.
+"""
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from camera_manager import CameraManager
+
+DEFAULT_PORT = 6010
+
+# One detection subscription per worker address and process; see WorkerClient.subscribe
+_subscriptions = {}
+_subscriptions_lock = threading.Lock()
+
+
+def load_config(data_dir):
+    """Contents of system_config.json ({} if missing or unreadable)"""
+    try:
+        with open(os.path.join(data_dir, "system_config.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def worker_address(data_dir, config=None):
+    """Unix socket in the data folder, or localhost TCP where AF_UNIX is unavailable (Windows).
+
+    system_config.json can override it with "anpr_worker": {"address": "path" or "host:port"}.
+    """
+    address = (config or {}).get("anpr_worker", {}).get("address")
+    if address:
+        host, _, port = address.rpartition(":")
+        return (host, int(port)) if host and port.isdigit() else address
+    if sys.platform == "win32":
+        return ("127.0.0.1", DEFAULT_PORT)
+    return os.path.join(os.path.abspath(data_dir), "anpr_worker.sock")
+
+
+def worker_authkey(data_dir):
+    """Shared secret both sides read from the data folder, so other local users can't drive the worker."""
+    path = os.path.join(data_dir, "anpr_worker.key")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        try:
+            # Owner-only from the start; O_EXCL lets the web app and worker race to create it safely
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(16))
+    else:
+        try:
+            os.chmod(path, 0o600)  # keys written before this was owner-only
+        except OSError:
+            pass
+    for _ in range(50):
+        with open(path, 'r') as f:
+            key = f.read().strip()
+        if key:
+            return key.encode()
+        time.sleep(0.1)  # the other side created the file but has not written the key yet
+    raise RuntimeError(f"ANPR worker key file {path} is empty")
+
+
+class ANPRWorker:
+    """Runs the CameraManager and ANPRSystem and answers WorkerClient requests.
+
+    With processes > 0 cameras are served by a ProcessCameraManager instead,
+    so inference uses that many cores.
+    """
+
+    ANPR_OPTIONS = {'confidence_threshold': 0.6, 'ocr_confidence_threshold': 0.5}
+
+    def __init__(self, data_dir="parking_data", backlog=1000, processes=None):
+        self.data_dir = data_dir
+        config = load_config(data_dir)
+        self.address = worker_address(data_dir, config)
+        self.authkey = worker_authkey(data_dir)
+        self.anpr_system = None
+        self._system_lock = threading.Lock()
+        processes = int(config.get("anpr_processes", 0)) if processes is None else processes
+        if processes > 0:
+            # Inference in several processes, fed frames through shared memory
+            from camera_processes import ProcessCameraManager
+            self.cameras = ProcessCameraManager(self._publish, processes=processes, anpr_options=self.ANPR_OPTIONS)
+        else:
+            self.cameras = CameraManager(self._get_anpr_system, self._publish,
+                                         workers=int(config.get("anpr_workers", 2)))
+        for camera_id, settings in config.get("cameras", {}).items():
+            settings = dict(settings)
+            self.cameras.add_camera(camera_id, settings.pop("source", camera_id), **settings)
+        self._subscribers = []
+        self._publish_lock = threading.Lock()
+        self._backlog = deque(maxlen=backlog)  # detections published while no client was listening
+        self._listener = None
+        self._running = False
+
+    def _get_anpr_system(self):
+        with self._system_lock:
+            if self.anpr_system is None:
+                try:
+                    from integrated_anpr_parking import ANPRSystem
+                    self.anpr_system = ANPRSystem(**self.ANPR_OPTIONS)
+                except Exception as e:
+                    print(f"Failed to initialize ANPR system: {e}")
+            return self.anpr_system
+
+    def _publish(self, camera_id, detections):
+        message = {'camera_id': camera_id, 'detections': detections, 'published_at': time.time()}
+        with self._publish_lock:
+            if not self._subscribers:
+                self._backlog.append(message)
+                return
+            for conn in list(self._subscribers):
+                try:
+                    conn.send(message)
+                except (OSError, EOFError):
+                    self._subscribers.remove(conn)
+            if not self._subscribers:
+                self._backlog.append(message)  # the last client went away mid-send
+
+    def _save_cameras(self):
+        system_config_file = os.path.join(self.data_dir, "system_config.json")
+        system_config = load_config(self.data_dir)
+        system_config["cameras"] = {camera_id: stream.settings()
+                                    for camera_id, stream in self.cameras.cameras().items()}
+        with open(system_config_file, 'w') as f:
+            json.dump(system_config, f, indent=2)
+
+    # ---- commands ----
+    def handle(self, cmd, **args):
+        if cmd == "ping":
+            return True
+        if cmd == "status":
+            return self.cameras.status()
+        if cmd == "start":
+            camera_id = str(args["camera_id"])
+            if camera_id not in self.cameras.cameras():
+                self.cameras.add_camera(camera_id, camera_id)  # bare device index
+            return self.cameras.start(camera_id)
+        if cmd == "stop":
+            if args.get("camera_id") is None:
+                self.cameras.stop_all()
+            else:
+                self.cameras.stop(args["camera_id"])
+            return True
+        if cmd == "add_camera":
+            self.cameras.add_camera(args["camera_id"], args["source"], **args.get("settings", {}))
+            self._save_cameras()
+            return True
+        if cmd == "remove_camera":
+            self.cameras.remove_camera(args["camera_id"])
+            self._save_cameras()
+            return True
+        if cmd == "process_image":
+            system = self._get_anpr_system()
+            return system.process_image(args["path"]) if system is not None else []
+        if cmd == "shutdown":
+            self.stop()
+            return True
+        raise ValueError(f"Unknown command: {cmd}")
+
+    # ---- IPC ----
+    def _serve_connection(self, conn):
+        try:
+            while True:
+                request = conn.recv()
+                if request.get("cmd") == "subscribe":
+                    with self._publish_lock:
+                        while self._backlog:
+                            conn.send(self._backlog.popleft())
+                        self._subscribers.append(conn)
+                    return  # the connection now belongs to _publish
+                try:
+                    reply = {'ok': True, 'result': self.handle(**request)}
+                except Exception as e:
+                    reply = {'ok': False, 'error': str(e)}
+                conn.send(reply)
+        except (EOFError, OSError):
+            conn.close()
+
+    def _claim_address(self):
+        """Remove a stale socket file; False if another worker is already listening on it."""
+        if isinstance(self.address, tuple) or not os.path.exists(self.address):
+            return True
+        try:
+            Client(self.address, authkey=self.authkey).close()
+            return False
+        except (OSError, EOFError):
+            os.remove(self.address)
+            return True
+
+    def serve(self, start=()):
+        if not self._claim_address():
+            print(f"An ANPR worker is already running on {self.address}")
+            return 1
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._running = True
+        print(f"ANPR worker listening on {self.address}")
+        for camera_id in start:
+            print(f"Camera {camera_id}: {'started' if self.handle('start', camera_id=camera_id) else 'failed'}")
+        try:
+            while self._running:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError):
+                    continue  # failed handshake
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            self._listener.close()
+        return 0
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self.cameras.close()
+        # Wake the accept() in serve() so it sees the flag
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError):
+            pass
+
+
+class WorkerClient:
+    """Web app side of the IPC: request/reply calls plus a background detection subscription."""
+
+    def __init__(self, data_dir="parking_data", timeout=5.0, image_timeout=120.0):
+        self.data_dir = data_dir
+        self.address = worker_address(data_dir, load_config(data_dir))
+        self.authkey = worker_authkey(data_dir)
+        self.timeout = timeout
+        self.image_timeout = image_timeout  # one-off images may load the models first
+
+    def request(self, cmd, **args):
+        """Result of one command; raises ConnectionError if the worker is not running or does not answer."""
+        # Every request has its own connection, so a slow one never holds up the others
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise ConnectionError(f"ANPR worker not reachable at {self.address}: {e}")
+        timeout = self.image_timeout if cmd == "process_image" else self.timeout
+        try:
+            conn.send(dict(args, cmd=cmd))
+            if not conn.poll(timeout):
+                raise ConnectionError(f"ANPR worker did not answer '{cmd}' in {timeout}s")
+            reply = conn.recv()
+        except (OSError, EOFError) as e:
+            raise ConnectionError(f"ANPR worker connection lost: {e}")
+        finally:
+            conn.close()
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def available(self):
+        try:
+            return self.request("ping")
+        except ConnectionError:
+            return False
+
+    def spawn(self, wait=10.0):
+        """Start a worker process in the background if none is running; True once it answers."""
+        if self.available():
+            return True
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anpr_worker.py")
+        with open(os.path.join(self.data_dir, "anpr_worker.log"), 'a') as log:
+            # The child keeps its own handle to the log
+            subprocess.Popen([sys.executable, "-u", script, "--data-dir", self.data_dir],
+                             stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(0.2)
+            if self.available():
+                return True
+        return False
+
+    def subscribe(self, callback, retry=2.0, on_stale=None, max_age=30.0):
+        """Call callback(camera_id, detections) for every published frame, reconnecting if the worker restarts.
+
+        There is one subscription per worker per process: subscribing again
+        only replaces the callbacks, so however many clients get created (one
+        per Streamlit rerun, say) each detection is handled once. Frames
+        published more than max_age seconds ago (the worker's backlog, replayed
+        after a reconnect) go to on_stale instead, or are dropped without it.
+        """
+        with _subscriptions_lock:
+            subscription = _subscriptions.get(str(self.address))
+            if subscription is not None:
+                subscription.update(callback=callback, on_stale=on_stale, max_age=max_age)
+                return
+            subscription = _subscriptions[str(self.address)] = {'callback': callback, 'on_stale': on_stale,
+                                                                 'max_age': max_age}
+        threading.Thread(target=self._listen, args=(subscription, retry), daemon=True).start()
+
+    def _listen(self, subscription, retry):
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                conn.send({'cmd': 'subscribe'})
+                while True:
+                    message = conn.recv()
+                    handler = subscription['callback']
+                    if time.time() - message.get('published_at', time.time()) > subscription['max_age']:
+                        handler = subscription['on_stale']
+                        if handler is None:
+                            continue
+                    try:
+                        handler(message['camera_id'], message['detections'])
+                    except Exception as e:
+                        print(f"Error handling ANPR detections: {e}")
+            except (OSError, EOFError):
+                time.sleep(retry)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ANPR models and cameras outside the web app")
+    parser.add_argument("--data-dir", default="parking_data")
+    parser.add_argument("--start", default="", help="comma-separated camera ids to start right away")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="inference processes (default: \"anpr_processes\" in system_config.json, 0 = threads)")
+    args = parser.parse_args(argv)
+    worker = ANPRWorker(args.data_dir, processes=args.processes)
+    return worker.serve(start=[camera_id for camera_id in args.start.split(",") if camera_id])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
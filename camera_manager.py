@@ -0,0 +1,212 @@
+#camera_manager.py
+#BuiltWithLove by @papitx0
+import threading
+import time
+from capture import FrameGrabber
+
+
+def parse_source(source):
+    """Device index for numeric sources ("0" -> 0), otherwise the URL or file path unchanged."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source.strip())
+    return source
+
+
+class CameraStream:
+    """One registered camera: its settings plus the per-camera ANPR state (tracker, gate, ROI, sampler)."""
+
+    def __init__(self, camera_id, source, width=1280, height=720, target_fps=3.0):
+        self.camera_id = camera_id
+        self.source = source
+        self.width = width
+        self.height = height
+        self.target_fps = target_fps
+        self.grabber = None
+        self.tracker = None
+        self.gate = None
+        self.roi = None
+        self.sampler = None
+        self.busy = False
+        self.frames_processed = 0
+        self.detections = 0
+        self.latency = None  # seconds from capture to decision for the last processed frame
+        self.error = None
+
+    @property
+    def running(self):
+        return self.grabber is not None
+
+    def settings(self):
+        return {'source': self.source, 'width': self.width, 'height': self.height, 'target_fps': self.target_fps}
+
+
+class CameraManager:
+    """Runs ANPR on any number of cameras with one model and a fixed pool of inference threads.
+
+    Each started camera only costs a capture thread and its small tracking
+    state. `workers` threads take the freshest sampled frame of whichever
+    camera is ready next (round robin, at most one frame per camera in
+    flight so its tracker sees frames in order), run it through the shared
+    ANPRSystem and pass the detections to on_detections(camera_id, detections).
+    get_system() returns the ANPRSystem, loading it on first use, or None.
+    """
+
+    def __init__(self, get_system, on_detections, workers=2):
+        self.get_system = get_system
+        self.on_detections = on_detections
+        self.workers = workers
+        self._streams = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._cursor = 0
+
+    def add_camera(self, camera_id, source, **settings):
+        """Register (or re-configure a stopped) camera; settings are width, height and target_fps."""
+        camera_id = str(camera_id)
+        with self._condition:
+            current = self._streams.get(camera_id)
+            if current is not None and current.running:
+                raise ValueError(f"Camera {camera_id} is running; stop it before changing its settings")
+            self._streams[camera_id] = CameraStream(camera_id, parse_source(source), **settings)
+            return self._streams[camera_id]
+
+    def remove_camera(self, camera_id):
+        camera_id = str(camera_id)
+        self.stop(camera_id)
+        with self._condition:
+            self._streams.pop(camera_id, None)
+
+    def cameras(self):
+        with self._condition:
+            return dict(self._streams)
+
+    def start(self, camera_id):
+        """Open the camera and begin processing it; False if unknown, ANPR is unavailable or it won't open."""
+        camera_id = str(camera_id)
+        stream = self._streams.get(camera_id)
+        if stream is None:
+            return False
+        if stream.running:
+            return True
+        system = self.get_system()
+        if system is None:
+            return False
+
+        sampler = system.create_sampler(camera_id, target_fps=stream.target_fps)
+        # The capture thread asks the sampler before decoding, so skipped frames are never decoded
+        grabber = FrameGrabber(stream.source, stream.width, stream.height, on_frame=self._wake,
+                               sample=sampler.should_sample)
+        if not grabber.start():
+            stream.error = f"Cannot open {stream.source}"
+            return False
+        stream.tracker = system.create_tracker()  # OCR each vehicle until its plate is agreed
+        stream.gate = system.create_motion_gate(camera_id)  # skip YOLO while the lane is static
+        stream.roi = system.create_roi(camera_id)  # run YOLO on the lane strip only
+        stream.sampler = sampler
+        stream.error = None
+        system.detector.register()
+        with self._condition:
+            stream.grabber = grabber
+            self._start_workers()
+        return True
+
+    def stop(self, camera_id):
+        camera_id = str(camera_id)
+        stream = self._streams.get(camera_id)
+        grabber = stream.grabber if stream is not None else None
+        if grabber is None:
+            return
+        grabber.stop()
+        self._finish(stream)
+
+    def stop_all(self):
+        for camera_id in list(self._streams):
+            self.stop(camera_id)
+
+    def close(self):
+        self.stop_all()
+
+    @property
+    def active(self):
+        return any(stream.running for stream in self._streams.values())
+
+    def _finish(self, stream):
+        with self._condition:
+            # Let a frame already in flight finish before releasing the camera
+            self._condition.wait_for(lambda: not stream.busy, timeout=10)
+            if stream.grabber is None:
+                return
+            stream.grabber = None
+        system = self.get_system()
+        if system is not None:
+            system.detector.unregister()
+
+    def _wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_frame(self):
+        """(stream, frame, captured_at) for the next ready camera, waiting until one has a sampled frame."""
+        with self._condition:
+            while True:
+                streams = list(self._streams.values())
+                for offset in range(len(streams)):
+                    stream = streams[(self._cursor + offset) % len(streams)]
+                    if not stream.running or stream.busy:
+                        continue
+                    item = stream.grabber.slot.get(timeout=0)
+                    if item is None:
+                        # A feed that ended (file finished, camera unplugged) releases its slot in the pool
+                        if stream.grabber.ended:
+                            self._finish(stream)
+                        continue
+                    _, captured_at, frame = item
+                    stream.busy = True
+                    self._cursor = (self._cursor + offset + 1) % len(streams)
+                    return stream, frame, captured_at
+                self._condition.wait(timeout=0.1)
+
+    def _work(self):
+        while True:
+            stream, frame, captured_at = self._next_frame()
+            started = time.time()
+            try:
+                detections = self.get_system().process_frame(frame, tracker=stream.tracker, gate=stream.gate,
+                                                             roi=stream.roi)
+                stream.frames_processed += 1
+                if detections:
+                    stream.detections += len(detections)
+                    self.on_detections(stream.camera_id, detections)
+                stream.latency = time.time() - captured_at
+                stream.sampler.record_latency(time.time() - started)
+            except Exception as e:
+                stream.error = str(e)
+                print(f"Error in camera {stream.camera_id}: {e}")
+            finally:
+                with self._condition:
+                    stream.busy = False
+                    self._condition.notify_all()
+
+    def status(self):
+        """One dict per camera: settings, running state and capture/sampling/gate counters."""
+        report = []
+        for camera_id, stream in self.cameras().items():
+            grabber = stream.grabber
+            entry = dict(stream.settings(), camera_id=camera_id, running=grabber is not None,
+                         frames_processed=stream.frames_processed, detections=stream.detections,
+                         latency_ms=round(stream.latency * 1000) if stream.latency is not None else None,
+                         error=stream.error)
+            if grabber is not None:
+                entry['capture'] = grabber.stats()
+            if stream.sampler is not None:
+                entry['sampling'] = stream.sampler.stats()
+            if stream.gate is not None:
+                entry['gate'] = stream.gate.stats()
+            report.append(entry)
+        return report
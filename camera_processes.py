@@ -0,0 +1,428 @@
+#camera_processes.py
+#BuiltWithLove by @papitx0
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.connection import wait
+from camera_manager import CameraStream, parse_source
+from frame_ring import FrameRing
+from frame_sampler import FrameSampler
+
+
+def _capture_main(camera_id, source, width, height, ring_spec, tasks, counters, stop):
+    """Capture process: decode frames into the shared ring and announce each (slot, seq) to the inference process.
+
+    The inference side's sampler sets the interval through the ring; frames
+    arriving in between are grabbed but not decoded, and every sampled frame
+    is processed. Sampling stats go along with the frames once a second.
+    """
+    import cv2
+    ring = FrameRing.attach(*ring_spec)
+    max_height, max_width = ring.max_shape[:2]
+    sampler = FrameSampler(target_fps=None, cpu_budget=None)
+    last_report = 0.0
+    cap = cv2.VideoCapture(source)
+    error = None
+    try:
+        if not cap.isOpened():
+            error = f"Cannot open {source}"
+            return
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        while not stop.is_set():
+            if not cap.grab():
+                break
+            captured_at = time.time()
+            counters[0] += 1
+            interval = ring.requested_interval
+            sampler.target_fps = 1.0 / interval if interval > 0 else None
+            if captured_at - last_report >= 1.0:
+                last_report = captured_at
+                tasks.put(('sampling', camera_id, sampler.stats()))
+            if not sampler.should_sample(captured_at):
+                continue
+            if not ring.available():
+                counters[1] += 1  # inference still holds every slot; don't decode a frame with nowhere to go
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            if frame.shape[0] > max_height or frame.shape[1] > max_width:
+                scale = min(max_height / frame.shape[0], max_width / frame.shape[1])
+                frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)),
+                                   interpolation=cv2.INTER_AREA)
+            item = ring.write(frame, captured_at)
+            if item is None:
+                counters[1] += 1
+                continue
+            tasks.put(('frame', camera_id) + item)
+    except Exception as e:
+        error = str(e)
+    finally:
+        cap.release()
+        ring.close()
+        tasks.put(('ended', camera_id, error))
+
+
+class _InferenceCamera:
+    def __init__(self, system, camera_id, ring_spec, target_fps):
+        self.ring = FrameRing.attach(*ring_spec)
+        self.tracker = system.create_tracker()
+        self.gate = system.create_motion_gate(camera_id)
+        self.roi = system.create_roi(camera_id)
+        self.sampler = system.create_sampler(camera_id, target_fps=target_fps)
+        self.ring.request_interval(self.sampler.interval)
+        self.capture_sampling = {}  # the capture process's sampler stats
+        self.frames_processed = 0
+        self.detections = 0
+        self.superseded = 0  # frames replaced by a newer one before inference got to them
+        self.latency = None
+        self.last_report = 0.0
+
+    def report(self):
+        return {
+            'frames_processed': self.frames_processed,
+            'detections': self.detections,
+            'superseded': self.superseded,
+            'latency': self.latency,
+            'sampling': dict(self.capture_sampling, target_fps=self.sampler.target_fps,
+                             interval_ms=round(self.sampler.interval * 1000, 1),
+                             latency_ms=round((self.sampler.latency or 0.0) * 1000, 1)),
+            'gate': self.gate.stats() if self.gate is not None else None,
+        }
+
+    def close(self):
+        try:
+            self.ring.close()
+        except BufferError:
+            pass  # a frame view is still referenced; the mapping goes away with the process
+
+
+def _inference_main(worker_id, tasks, results, anpr_options):
+    """Inference process: one ANPRSystem serving the cameras assigned to it, always on their newest frame.
+
+    results is this process's own pipe to the manager, so a process that is
+    killed mid-send cannot leave a shared queue lock held for the others.
+    """
+    try:
+        from integrated_anpr_parking import ANPRSystem
+        system = ANPRSystem(**anpr_options)
+    except Exception as e:
+        results.send(('failed', worker_id, f"ANPR system failed to load: {e}"))
+        return
+    results.send(('ready', worker_id, None))
+    cameras = {}
+    pending = OrderedDict()  # camera_id -> newest (slot, seq); insertion order gives round robin
+
+    def handle(message):
+        kind, camera_id = message[0], message[1] if len(message) > 1 else None
+        if kind == 'attach':
+            cameras[camera_id] = _InferenceCamera(system, camera_id, message[2], message[3])
+        elif kind == 'frame' and camera_id in cameras:
+            if camera_id in pending:
+                cameras[camera_id].superseded += 1
+                cameras[camera_id].ring.release(pending[camera_id][0])  # hand the skipped frame's slot back
+            pending[camera_id] = message[2:]
+        elif kind == 'sampling' and camera_id in cameras:
+            cameras[camera_id].capture_sampling = message[2]
+        elif kind == 'ended':
+            pending.pop(camera_id, None)
+            camera = cameras.pop(camera_id, None)
+            if camera is not None:
+                results.send(('stats', camera_id, camera.report()))
+                camera.close()
+            results.send(('ended', camera_id, message[2]))
+        elif kind == 'exit':
+            return False
+        return True
+
+    while True:
+        # Take every queued message first so only the newest frame of each camera is left
+        try:
+            message = tasks.get(timeout=0.5) if not pending else tasks.get_nowait()
+            if not handle(message):
+                break
+            continue
+        except queue.Empty:
+            pass
+        if not pending:
+            continue
+
+        camera_id, (slot, seq) = pending.popitem(last=False)
+        camera = cameras[camera_id]
+        item = camera.ring.read(slot, seq)
+        if item is None:
+            camera.superseded += 1
+            continue  # not our frame any more, so not ours to release
+        captured_at, frame = item
+        # Already sampled by the capture process, which only decodes frames that are due
+        started = time.time()
+        try:
+            detections = system.process_frame(frame, tracker=camera.tracker, gate=camera.gate, roi=camera.roi)
+        except Exception as e:
+            detections = []
+            results.send(('error', camera_id, str(e)))
+        camera.frames_processed += 1
+        camera.latency = time.time() - captured_at
+        camera.sampler.record_latency(time.time() - started)
+        camera.ring.request_interval(camera.sampler.interval)
+        if detections:
+            camera.detections += len(detections)
+            results.send(('detections', camera_id, detections))
+        frame = item = None  # drop the view before releasing the slot
+        camera.ring.release(slot)
+        if time.time() - camera.last_report >= 1.0:
+            camera.last_report = time.time()
+            results.send(('stats', camera_id, camera.report()))
+
+    for camera in cameras.values():
+        camera.close()
+
+
+class ProcessCameraManager:
+    """CameraManager that spreads cameras over several inference processes fed through shared memory.
+
+    Each started camera gets a capture process that decodes the frames its
+    sampler picks into its own FrameRing; only (slot, seq) announcements
+    cross the process boundary, so 2.7 MB frames are never pickled. Cameras
+    are pinned to the least loaded of `processes` inference processes (each
+    with its own ANPRSystem), which keeps one camera's frames in order for
+    its tracker while several cores run inference in parallel. Same interface as CameraManager. An inference
+    process that dies is replaced on the next start(); its cameras stop with
+    an error.
+    """
+
+    def __init__(self, on_detections, processes=2, anpr_options=None, slots=8, max_shape=(720, 1280, 3),
+                 load_timeout=120.0):
+        self.on_detections = on_detections
+        self.processes = processes
+        self.anpr_options = dict(anpr_options or {})
+        self.slots = slots
+        self.max_shape = max_shape
+        self.load_timeout = load_timeout  # seconds an inference process may take to load the models
+        self._context = multiprocessing.get_context("spawn")  # safe with threads and CUDA
+        self._streams = {}
+        self._running = {}  # camera_id -> dict(process, ring, stop, counters, worker, ended)
+        self._workers = []  # dict(id, process, tasks, cameras, ready, error) per inference process
+        self._worker_ids = 0
+        self._reader = None
+        self._lock = threading.RLock()
+
+    def add_camera(self, camera_id, source, **settings):
+        """Register (or re-configure a stopped) camera; settings are width, height and target_fps."""
+        camera_id = str(camera_id)
+        with self._lock:
+            if camera_id in self._running:
+                raise ValueError(f"Camera {camera_id} is running; stop it before changing its settings")
+            self._streams[camera_id] = CameraStream(camera_id, parse_source(source), **settings)
+            return self._streams[camera_id]
+
+    def remove_camera(self, camera_id):
+        camera_id = str(camera_id)
+        self.stop(camera_id)
+        with self._lock:
+            self._streams.pop(camera_id, None)
+
+    def cameras(self):
+        with self._lock:
+            return dict(self._streams)
+
+    @property
+    def active(self):
+        return bool(self._running)
+
+    def _spawn_worker(self):
+        self._worker_ids += 1
+        tasks = self._context.Queue()
+        results, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_inference_main,
+                                        args=(self._worker_ids, tasks, sender, self.anpr_options), daemon=True)
+        process.start()
+        sender.close()  # only the child writes; our copy would keep EOF from ever arriving
+        return {'id': self._worker_ids, 'process': process, 'tasks': tasks, 'results': results, 'cameras': set(),
+                'ready': threading.Event(), 'error': None}
+
+    def _start_workers(self):
+        """Start the inference processes, replacing any that died since."""
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_results, daemon=True)
+            self._reader.start()
+        self._check_workers()
+        self._workers = [worker for worker in self._workers
+                         if worker['process'].is_alive() and worker['error'] is None]
+        while len(self._workers) < self.processes:
+            self._workers.append(self._spawn_worker())
+
+    def _wait_ready(self, worker):
+        """True once the worker loaded its ANPRSystem; False if it failed, died or took too long."""
+        deadline = time.time() + self.load_timeout
+        while not worker['ready'].wait(timeout=0.5):
+            if not worker['process'].is_alive():
+                worker['error'] = worker['error'] or f"Inference process exited (code {worker['process'].exitcode})"
+                return False
+            if time.time() > deadline:
+                worker['error'] = f"Inference process did not load the ANPR system in {self.load_timeout:.0f}s"
+                return False
+        return worker['error'] is None
+
+    def start(self, camera_id):
+        """Start the camera's capture process and pin it to an inference process."""
+        camera_id = str(camera_id)
+        with self._lock:
+            stream = self._streams.get(camera_id)
+            if stream is None:
+                return False
+            if camera_id in self._running:
+                return True
+            self._start_workers()
+            worker = min(self._workers, key=lambda item: len(item['cameras']))
+        # Wait outside the lock: the result reader needs it to notice dead processes
+        if not self._wait_ready(worker):
+            stream.error = worker['error']
+            return False
+        with self._lock:
+            if camera_id in self._running:
+                return True
+            ring = FrameRing.create(self.slots, self.max_shape)
+            stop = self._context.Event()
+            # Frames captured and frames dropped because the ring was full, written by the capture process
+            counters = self._context.Array('q', 2, lock=False)
+            worker['tasks'].put(('attach', camera_id, ring.spec(), stream.target_fps))
+            process = self._context.Process(
+                target=_capture_main,
+                args=(camera_id, stream.source, stream.width, stream.height, ring.spec(), worker['tasks'], counters,
+                      stop),
+                daemon=True)
+            process.start()
+            worker['cameras'].add(camera_id)
+            stream.error = None
+            self._running[camera_id] = {'process': process, 'ring': ring, 'stop': stop, 'counters': counters,
+                                        'worker': worker, 'ended': threading.Event(), 'report': {}}
+            return True
+
+    def stop(self, camera_id):
+        camera_id = str(camera_id)
+        with self._lock:
+            running = self._running.get(camera_id)
+        if running is None:
+            return
+        running['stop'].set()
+        running['process'].join(timeout=5)
+        # Wait until the inference process let go of the ring before unlinking it
+        if running['worker']['process'].is_alive():
+            running['ended'].wait(timeout=5)
+        self._release(camera_id)
+
+    def stop_all(self):
+        for camera_id in list(self._running):
+            self.stop(camera_id)
+
+    def _release(self, camera_id):
+        with self._lock:
+            running = self._running.pop(camera_id, None)
+            if running is None:
+                return
+            running['worker']['cameras'].discard(camera_id)
+        # A capture process whose inference process died can hang flushing its task queue on exit
+        running['process'].join(timeout=5)
+        if running['process'].is_alive():
+            running['process'].terminate()
+        running['ring'].close()
+
+    def close(self):
+        """Stop every camera and the inference processes."""
+        self.stop_all()
+        for worker in self._workers:
+            if worker['process'].is_alive():
+                worker['tasks'].put(('exit',))
+                worker['process'].join(timeout=5)
+        self._workers = []
+
+    def _check_workers(self):
+        """Stop the cameras of inference processes that died; nothing else would ever end them."""
+        with self._lock:
+            dead = [worker for worker in self._workers if not worker['process'].is_alive() and worker['cameras']]
+            for worker in dead:
+                reason = worker['error'] or f"Inference process exited (code {worker['process'].exitcode})"
+                for camera_id in list(worker['cameras']):
+                    stream = self._streams.get(camera_id)
+                    running = self._running.get(camera_id)
+                    if stream is not None:
+                        stream.error = reason
+                    if running is not None:
+                        running['stop'].set()  # the capture process would fill a queue nobody reads
+                        running['ended'].set()
+                        threading.Thread(target=self._release, args=(camera_id,), daemon=True).start()
+                worker['cameras'].clear()
+
+    def _read_results(self):
+        checked = time.time()
+        while True:
+            workers = {worker['results']: worker for worker in list(self._workers) if worker['results'] is not None}
+            if workers:
+                ready = wait(list(workers), timeout=1.0)
+            else:
+                ready = []
+                time.sleep(0.5)
+            for conn in ready:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    workers[conn]['results'] = None  # the process exited; _check_workers handles its cameras
+                    conn.close()
+                    continue
+                self._handle_result(workers[conn], *message)
+            if time.time() - checked >= 1.0:
+                checked = time.time()
+                self._check_workers()
+
+    def _handle_result(self, worker, kind, camera_id, payload):
+        if kind in ('ready', 'failed'):
+            worker['error'] = payload
+            worker['ready'].set()
+            return
+        stream = self._streams.get(camera_id)
+        running = self._running.get(camera_id)
+        if kind == 'detections':
+            try:
+                self.on_detections(camera_id, payload)
+            except Exception as e:
+                print(f"Error handling detections of camera {camera_id}: {e}")
+        elif kind == 'stats' and stream is not None:
+            stream.frames_processed = payload['frames_processed']
+            stream.detections = payload['detections']
+            stream.latency = payload['latency']
+            if running is not None:
+                running['report'] = payload
+        elif kind == 'error' and stream is not None:
+            stream.error = payload
+        elif kind == 'ended':
+            if stream is not None and payload:
+                stream.error = payload
+            if running is not None:
+                running['ended'].set()
+                if not running['stop'].is_set():
+                    # The feed ended on its own (file finished, camera unplugged)
+                    threading.Thread(target=self._release, args=(camera_id,), daemon=True).start()
+
+    def status(self):
+        """One dict per camera, in the same shape as CameraManager.status()."""
+        report = []
+        for camera_id, stream in self.cameras().items():
+            running = self._running.get(camera_id)
+            entry = dict(stream.settings(), camera_id=camera_id, running=running is not None,
+                         frames_processed=stream.frames_processed, detections=stream.detections,
+                         latency_ms=round(stream.latency * 1000) if stream.latency is not None else None,
+                         error=stream.error)
+            if running is not None:
+                stats = running['report']
+                entry['capture'] = {'captured': running['counters'][0],
+                                    'dropped': stats.get('superseded', 0) + running['counters'][1]}
+                if stats.get('sampling'):
+                    entry['sampling'] = stats['sampling']
+                if stats.get('gate'):
+                    entry['gate'] = stats['gate']
+            report.append(entry)
+        return report
@@ -0,0 +1,93 @@
+#camera_roi.py
+#BuiltWithLove by @papitx0
+import math
+import numpy as np
+import cv2
+
+
+def stride_aligned_size(shape, max_size=640, stride=32):
+    """[height, width] for YOLO: scaled so the longer side is at most max_size, rounded up to the stride."""
+    height, width = shape[:2]
+    scale = min(1.0, max_size / float(max(height, width, 1)))
+    return [max(stride, int(math.ceil(side * scale / stride)) * stride) for side in (height, width)]
+
+
+class CameraROI:
+    """Lane region of one camera, used to run plate detection on a small crop.
+
+    `polygon` is a list of [x, y] points as fractions of the frame. Detection
+    runs on the polygon's bounding box (pixels outside the polygon are blanked)
+    at a stride-aligned input size instead of the full frame, and the boxes it
+    returns are shifted back to full-frame coordinates.
+    """
+
+    STRIDE = 32
+    FILL = 114  # the grey YOLO uses for letterbox padding
+
+    def __init__(self, polygon, max_size=640):
+        self.polygon = [tuple(point) for point in polygon]
+        self.max_size = max_size
+        self._shape = None
+        self._rect = None
+        self._mask = None
+
+    @classmethod
+    def from_config(cls, config, camera_id):
+        """ROI from system_config.json's "camera_rois" section, or None if the camera has none."""
+        polygon = config.get("camera_rois", {}).get(str(camera_id))
+        return cls(polygon) if polygon and len(polygon) >= 3 else None
+
+    def bounds(self):
+        """Bounding box of the polygon as (x1, y1, x2, y2) fractions."""
+        xs = [point[0] for point in self.polygon]
+        ys = [point[1] for point in self.polygon]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def _setup(self, shape):
+        height, width = shape[:2]
+        points = np.array([[int(round(x * width)), int(round(y * height))] for x, y in self.polygon], dtype=np.int32)
+        x1, y1 = max(points[:, 0].min(), 0), max(points[:, 1].min(), 0)
+        x2, y2 = min(points[:, 0].max(), width), min(points[:, 1].max(), height)
+        self._rect = (int(x1), int(y1), int(x2), int(y2))
+        # Axis-aligned rectangles need no mask; other polygons blank what lies outside them
+        is_rectangle = len(self.polygon) == 4 and len({x for x, _ in self.polygon}) == 2 \
+            and len({y for _, y in self.polygon}) == 2
+        if is_rectangle:
+            self._mask = None
+        else:
+            self._mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(self._mask, [points - [x1, y1]], 255)
+        self._shape = shape[:2]
+
+    def crop(self, frame):
+        """(crop, (x_offset, y_offset), imgsz) for running detection on the lane only."""
+        if self._shape != frame.shape[:2]:
+            self._setup(frame.shape)
+        x1, y1, x2, y2 = self._rect
+        crop = frame[y1:y2, x1:x2]
+        if self._mask is not None:
+            crop = crop.copy()
+            crop[self._mask == 0] = self.FILL
+        return crop, (x1, y1), self.input_size(crop.shape)
+
+    def input_size(self, shape):
+        """Stride-aligned [height, width] for YOLO, scaled so the longer side is at most max_size."""
+        return stride_aligned_size(shape, self.max_size, self.STRIDE)
+
+    @staticmethod
+    def to_frame(plates, offset):
+        """Shift detection boxes from crop to full-frame coordinates."""
+        dx, dy = offset
+        for plate in plates:
+            x1, y1, x2, y2 = plate['bbox']
+            plate['bbox'] = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        return plates
+
+    def input_ratio(self, frame_shape, full_size=640):
+        """How many times fewer pixels YOLO gets compared to the full frame."""
+        if self._shape != tuple(frame_shape[:2]):
+            self._setup(frame_shape)
+        x1, y1, x2, y2 = self._rect
+        roi_h, roi_w = self.input_size((y2 - y1, x2 - x1))
+        full_h, full_w = CameraROI([(0, 0), (1, 0), (1, 1), (0, 1)], full_size).input_size(frame_shape)
+        return round((full_h * full_w) / float(roi_h * roi_w), 2)
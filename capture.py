@@ -0,0 +1,136 @@
+#capture.py
+#BuiltWithLove by @papitx0
+import threading
+import time
+
+
+class LatestFrame:
+    """Single-slot frame buffer: put() overwrites, get() waits for a frame newer than the last one taken.
+
+    Frames the consumer was too slow to take are dropped instead of queued,
+    so the inference stage always works on the freshest frame.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._timestamp = None
+        self._seq = 0
+        self._taken = 0
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame, timestamp=None):
+        with self._condition:
+            if self._seq > self._taken:
+                self.dropped += 1  # previous frame was never taken
+            self._frame = frame
+            self._timestamp = time.time() if timestamp is None else timestamp
+            self._seq += 1
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """(seq, timestamp, frame) of the newest untaken frame; None on timeout or once closed and drained."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > self._taken or self._closed, timeout):
+                return None
+            if self._seq == self._taken:
+                return None
+            self._taken = self._seq
+            return self._seq, self._timestamp, self._frame
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class FrameGrabber:
+    """Capture thread for one camera feeding a LatestFrame slot.
+
+    The thread reads the device as fast as it delivers frames, so the
+    driver's own buffer never backs up while inference is busy; read_latest()
+    hands the consumer the most recent frame and its capture time. on_frame,
+    if given, is called after each new frame and once when the feed ends.
+    sample(timestamp), if given, picks the frames worth decoding; the others
+    are only grabbed, which skips their decode and copy.
+    """
+
+    def __init__(self, source, width=1280, height=720, on_frame=None, sample=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.on_frame = on_frame
+        self.sample = sample
+        self.slot = LatestFrame()
+        self.captured = 0
+        self.skipped = 0
+        self._cap = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Open the source and start capturing; False if it cannot be opened."""
+        import cv2
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            self._cap.release()
+            return False
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            while self._running:
+                if not self._cap.grab():
+                    break
+                timestamp = time.time()
+                self.captured += 1
+                if self.sample is not None and not self.sample(timestamp):
+                    self.skipped += 1
+                    continue
+                ret, frame = self._cap.retrieve()
+                if not ret:
+                    break
+                self.slot.put(frame, timestamp)
+                if self.on_frame is not None:
+                    self.on_frame()
+        finally:
+            self._running = False
+            self.slot.close()
+            self._cap.release()
+            if self.on_frame is not None:
+                self.on_frame()
+
+    def read_latest(self, timeout=1.0):
+        """(frame, capture timestamp) of the newest frame, (None, None) if none arrived in time or the feed ended."""
+        item = self.slot.get(timeout)
+        if item is None:
+            return None, None
+        _, timestamp, frame = item
+        return frame, timestamp
+
+    @property
+    def ended(self):
+        """True once the source stopped delivering frames (or stop() was called)."""
+        return self.slot.closed
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            'captured': self.captured,
+            'dropped': self.slot.dropped,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,286 @@
+#detection_store.py
+#BuiltWithLove by @papitx0
+import os
+import csv
+import glob
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, date, timedelta
+import pandas as pd
+from storage import DETECTION_COLUMNS, normalize_plate
+
+
+class RecentSightings:
+    """In-memory "last seen" index: plate -> ring buffer of (time, confidence).
+
+    Fed by the detection writers of this process, so arrival checks are a
+    dictionary lookup and never read detection files.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, data_dir="parking_data"):
+        key = os.path.abspath(data_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls()
+            return cls._instances[key]
+
+    def __init__(self, per_plate=16):
+        self.per_plate = per_plate
+        self._plates = {}
+        self._lock = threading.Lock()
+        self.seeded = False
+
+    @staticmethod
+    def _parse_time(value):
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return datetime.now()
+
+    def record(self, plate, detection_time=None, confidence=None):
+        key = normalize_plate(plate)
+        if not key:
+            return
+        seen_at = self._parse_time(detection_time) if detection_time is not None else datetime.now()
+        with self._lock:
+            ring = self._plates.get(key)
+            if ring is None:
+                ring = self._plates[key] = deque(maxlen=self.per_plate)
+            ring.append((seen_at, confidence))
+
+    def record_rows(self, rows):
+        for row in rows:
+            self.record(row.get('plate_number'), row.get('detection_time'), row.get('confidence'))
+
+    def seed(self, load_recent):
+        """Fill the index once from load_recent() (a detections frame), e.g. after a restart."""
+        with self._lock:
+            if self.seeded:
+                return
+            self.seeded = True
+        df = load_recent()
+        if not df.empty:
+            self.record_rows(df.to_dict('records'))
+
+    def last_seen(self, plate, within=None):
+        """Latest sighting of a plate as {'plate_number', 'detection_time', 'confidence'}, or None.
+
+        within (seconds or timedelta) ignores sightings older than that.
+        """
+        with self._lock:
+            ring = self._plates.get(normalize_plate(plate))
+            if not ring:
+                return None
+            seen_at, confidence = max(ring, key=lambda sighting: sighting[0])
+        if within is not None:
+            if not isinstance(within, timedelta):
+                within = timedelta(seconds=within)
+            if seen_at < datetime.now() - within:
+                return None
+        return {'plate_number': normalize_plate(plate), 'detection_time': seen_at, 'confidence': confidence}
+
+
+class DetectionStore:
+    """Append-only ANPR detection log split into one CSV segment per day.
+
+    New detections go into an in-memory tail buffer that a background thread
+    appends to the matching day segment at most flush_interval seconds later
+    (or sooner once max_buffer rows are waiting). Saving a detection never
+    reads or rewrites existing data, and old days can be read or deleted one
+    segment at a time. The single-file anpr_detections.csv from older versions
+    is still included when reading.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, data_dir="parking_data", flush_interval=1.0):
+        """Return the shared store for this data directory."""
+        key = os.path.abspath(data_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(data_dir, flush_interval)
+            return cls._instances[key]
+
+    def __init__(self, data_dir="parking_data", flush_interval=1.0, max_buffer=256):
+        self.data_dir = data_dir
+        self.segment_dir = os.path.join(data_dir, "anpr_detections")
+        self.legacy_file = os.path.join(data_dir, "anpr_detections.csv")
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_id = None
+        self.sightings = RecentSightings.open(data_dir)
+
+    # ---- segments ----
+    def segment_path(self, day):
+        return os.path.join(self.segment_dir, f"{day}.csv")
+
+    def segments(self):
+        """(day, path) for every segment on disk, oldest first."""
+        found = []
+        for path in glob.glob(os.path.join(self.segment_dir, "*.csv")):
+            try:
+                day = date.fromisoformat(os.path.basename(path)[:-4])
+            except ValueError:
+                continue
+            found.append((day, path))
+        return sorted(found)
+
+    @staticmethod
+    def _day_of(detection_time):
+        # detection_time is written as 'YYYY-MM-DD HH:MM:SS' or ISO format
+        text = str(detection_time or "")[:10]
+        try:
+            return date.fromisoformat(text).isoformat()
+        except ValueError:
+            return date.today().isoformat()
+
+    # ---- writing ----
+    def _load_next_id(self):
+        # Only the newest segment (or the legacy file) can hold the highest id
+        last_id = 0
+        segments = self.segments()
+        for path in ([segments[-1][1]] if segments else []) + [self.legacy_file]:
+            if os.path.exists(path):
+                try:
+                    ids = pd.read_csv(path, usecols=['id'])['id']
+                    if not ids.empty:
+                        last_id = max(last_id, int(ids.max()))
+                except (ValueError, KeyError, pd.errors.EmptyDataError):
+                    continue
+            if last_id:
+                break
+        self._next_id = last_id + 1
+
+    def append(self, rows):
+        """Buffer detection rows, assigning ids; returns the rows as stored."""
+        with self._lock:
+            if self._next_id is None:
+                self._load_next_id()
+            stored = []
+            for row in rows:
+                row = {column: row.get(column) for column in DETECTION_COLUMNS}
+                row['id'] = self._next_id
+                self._next_id += 1
+                stored.append(row)
+            self._buffer.extend(stored)
+            full = len(self._buffer) >= self.max_buffer
+        self.sightings.record_rows(stored)
+        self.start()
+        if full:
+            self._wake.set()
+        return stored
+
+    def flush(self):
+        """Append buffered rows to their day segments."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(self._day_of(row['detection_time']), []).append(row)
+            try:
+                for day, day_rows in by_day.items():
+                    path = self.segment_path(day)
+                    new_file = not os.path.exists(path)
+                    with open(path, 'a', newline='', encoding='utf-8') as f:
+                        writer = csv.DictWriter(f, fieldnames=DETECTION_COLUMNS)
+                        if new_file:
+                            writer.writeheader()
+                        writer.writerows(day_rows)
+            except Exception:
+                # Put the rows back so the next flush retries them
+                with self._lock:
+                    self._buffer[:0] = rows
+                raise
+            return len(rows)
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is not None:
+                    return
+                self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[DETECTION FLUSH ERROR] {e}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    # ---- reading ----
+    def read(self, since=None, until=None):
+        """Detections between two dates/datetimes (inclusive days), buffered rows included."""
+        first = since.date() if isinstance(since, datetime) else since
+        last = until.date() if isinstance(until, datetime) else until
+        frames = []
+        # Holding the flush lock keeps rows from being between buffer and disk while we read
+        with self._flush_lock:
+            # Pre-segment detections have no day file; the mask below picks the rows in range.
+            # The file stopped changing at the upgrade, so a later range can skip it.
+            if os.path.exists(self.legacy_file) and \
+                    (first is None or date.fromtimestamp(os.path.getmtime(self.legacy_file)) >= first):
+                frames.append(pd.read_csv(self.legacy_file))
+            for day, path in self.segments():
+                if (first is None or day >= first) and (last is None or day <= last):
+                    frames.append(pd.read_csv(path))
+            with self._lock:
+                buffered = [dict(row) for row in self._buffer]
+        if buffered:
+            frames.append(pd.DataFrame(buffered))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=DETECTION_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        if since is not None or until is not None:
+            times = pd.to_datetime(df['detection_time'], errors='coerce')
+            mask = pd.Series(True, index=df.index)
+            if first is not None:
+                mask &= times.dt.date >= first
+            if last is not None:
+                mask &= times.dt.date <= last
+            if isinstance(since, datetime):
+                mask &= times >= since
+            if isinstance(until, datetime):
+                mask &= times <= until
+            df = df[mask]
+        return df.reset_index(drop=True)
+
+    def prune(self, keep_days=30):
+        """Delete whole segments older than keep_days; returns how many were removed."""
+        cutoff = date.today() - timedelta(days=keep_days)
+        removed = 0
+        for day, path in self.segments():
+            if day < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
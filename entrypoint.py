@@ -225,26 +225,20 @@ def render_admin_login_page():
 def _activate_reservation_from_anpr(db, reservation):
     """Activate a reservation when ANPR detects the vehicle."""
     try:
-        # Get the current reservations data
-        df = db.get_reservations_history()
-
-        # Find the specific reservation to activate
-        mask = (df['plate_number'].str.upper() == reservation['plate_number'].upper()) & \
-               (df['created_at'] == reservation['created_at'])
-
         # Update reservation status and timing (fixed 15 minutes)
         now = datetime.now()
         end_time = now + pd.Timedelta(minutes=15)
 
-        df.loc[mask, 'status'] = 'active'
-        df.loc[mask, 'start_time'] = now.strftime('%Y-%m-%d %H:%M:%S')
-        df.loc[mask, 'end_time'] = end_time.strftime('%Y-%m-%d %H:%M:%S')
+        with db.transaction():
+            db.update_reservation(
+                reservation['id'],
+                status='active',
+                start_time=now.strftime('%Y-%m-%d %H:%M:%S'),
+                end_time=end_time.strftime('%Y-%m-%d %H:%M:%S')
+            )
 
-        # Update spot status to occupied
-        db.update_spot_status(reservation['spot_id'], 'occupied')
-
-        # Save the updated reservations
-        df.to_csv(db.reservations_file, index=False)
+            # Update spot status to occupied
+            db.update_spot_status(reservation['spot_id'], 'occupied')
 
         return True
 
@@ -275,13 +269,8 @@ def render_reservation_status_page(db):
         return
 
     try:
-        # Fetch and filter reservations
-        df = db.get_reservations_history()
-        if df.empty:
-            st.warning("No reservations found in the system.")
-            return
-
-        user_reservations = df[df['plate_number'].str.upper() == st.session_state.user_plate]
+        # Fetch this plate's reservations through the plate index
+        user_reservations = db.find_reservations(plate=st.session_state.user_plate)
 
         if user_reservations.empty:
             st.info(f"🔍 No reservations found for plate **{st.session_state.user_plate}**")
@@ -397,13 +386,9 @@ def _handle_waiting_status(db, reservation):
 def _cancel_expired_reservation(db, reservation):
     """Cancel a reservation that exceeded the waiting timeout."""
     try:
-        df = db.get_reservations_history()
-        mask = (df['plate_number'].str.upper() == reservation['plate_number'].upper()) & \
-               (df['created_at'] == reservation['created_at'])
-
-        df.loc[mask, 'status'] = 'cancelled'
-        db.update_spot_status(reservation['spot_id'], 'available')
-        df.to_csv(db.reservations_file, index=False)
+        with db.transaction():
+            db.update_reservation(reservation['id'], status='cancelled')
+            db.update_spot_status(reservation['spot_id'], 'available')
 
         st.error("❌ **Reservation Cancelled**")
         st.markdown("Your reservation was cancelled because no vehicle was detected within 30 minutes.")
@@ -516,23 +501,8 @@ def _display_reservation_history(reservations):
 def _check_anpr_detection(db, plate_number):
     """Check if ANPR has detected the given plate number recently."""
     try:
-        if not os.path.exists(db.anpr_detections_file):
-            return False
-
-        detections_df = pd.read_csv(db.anpr_detections_file)
-        if detections_df.empty:
-            return False
-
         # Look for recent detections (within last 5 minutes) of this plate
-        recent_time = datetime.now() - pd.Timedelta(minutes=5)
-        detections_df['detection_time'] = pd.to_datetime(detections_df['detection_time'])
-
-        recent_detections = detections_df[
-            (detections_df['plate_number'].str.upper() == plate_number.upper()) &
-            (detections_df['detection_time'] >= recent_time)
-            ]
-
-        return not recent_detections.empty
+        return db.last_seen(plate_number, within=pd.Timedelta(minutes=5)) is not None
 
     except Exception as e:
         st.error(f"Error checking ANPR detections: {e}")
@@ -989,25 +959,12 @@ def render_user_admin_panel():
 
 
 
-def start_expired_reservations_cleaner(db, interval=60):
-    """Run clean_expired_reservations every 'interval' seconds in the background."""
-    def cleaner():
-        while True:
-            try:
-                db.clean_expired_reservations()
-            except Exception as e:
-                print(f"[CLEANER ERROR] {e}")
-            time.sleep(interval)
-
-    t = threading.Thread(target=cleaner, daemon=True)
-    t.start()
-
 # App entrypoint
 def main():
     init_session()
     db = get_db()
     anpr_integration = get_anpr()  # ✅ Initialize ANPR integration
-    db.clean_expired_reservations()
+    db.start_expiry_scheduler()  # no-op after the first run
 
     st.sidebar.title("🧭 SmartPark Navigation")
     pages = [
@@ -1075,8 +1032,8 @@ def main():
 
 if __name__ == "__main__":
 
-    db = ParkingDatabase()
-    anpr_integration = ANPRParkingIntegration(db)
-    start_expired_reservations_cleaner(db, interval=30)
+    db = get_db()
+    anpr_integration = get_anpr()  # cached, so reruns don't add detection subscribers
+    db.start_expiry_scheduler()
 
     main()
@@ -0,0 +1,138 @@
+#expiry_scheduler.py
+#BuiltWithLove by @papitx0
+import os
+import heapq
+import atexit
+import threading
+from datetime import datetime
+
+
+class ExpiryScheduler:
+    """Background service that expires active reservations when their end_time passes.
+
+    Active reservations sit in a min-heap ordered by end_time, so each wake-up
+    only pops the entries that are actually due. Writes through ParkingDatabase
+    schedule entries directly; a periodic resync from the store's status index
+    picks up reservations written by other processes. Entries are never removed
+    eagerly: when one comes due the reservation is re-read and skipped if it is
+    no longer active or its end_time has changed.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, db, resync_interval=60.0):
+        """Return the shared scheduler for this database's data directory."""
+        key = os.path.abspath(db.data_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(db, resync_interval)
+            return cls._instances[key]
+
+    def __init__(self, db, resync_interval=60.0):
+        self.db = db
+        self.resync_interval = resync_interval
+        self._heap = []  # (end_time, reservation_id)
+        self._scheduled = {}  # reservation_id -> end_time of its live heap entry
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self.expired_count = 0
+
+    @staticmethod
+    def _parse(end_time):
+        if isinstance(end_time, datetime):
+            return end_time
+        if not isinstance(end_time, str) or not end_time:
+            return None
+        try:
+            return datetime.fromisoformat(end_time)
+        except ValueError:
+            return None
+
+    def schedule(self, reservation_id, end_time):
+        """Queue an active reservation for expiry at end_time (datetime or ISO string)."""
+        due = self._parse(end_time)
+        if due is None:
+            return False
+        reservation_id = int(reservation_id)
+        with self._cond:
+            if self._scheduled.get(reservation_id) == due:
+                return False
+            self._scheduled[reservation_id] = due
+            heapq.heappush(self._heap, (due, reservation_id))
+            if self._heap[0] == (due, reservation_id):
+                self._cond.notify()  # new earliest deadline: wake the worker
+        return True
+
+    def resync(self):
+        """Schedule every reservation the store currently lists as active."""
+        active = self.db.find_reservations(status='active')
+        for row in active.to_dict('records'):
+            self.schedule(row['id'], row.get('end_time'))
+        return len(active)
+
+    def pop_due(self, now=None):
+        """Remove and return ids whose end_time is before now."""
+        now = now or datetime.now()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] < now:
+                end_time, reservation_id = heapq.heappop(self._heap)
+                if self._scheduled.get(reservation_id) == end_time:
+                    del self._scheduled[reservation_id]
+                    due.append(reservation_id)
+        return due
+
+    def run_due(self, now=None):
+        """Expire whatever is due right now; returns the number of reservations expired."""
+        due = self.pop_due(now)
+        if not due:
+            return 0
+        expired = self.db.expire_reservations(due, now=now)
+        self.expired_count += expired
+        return expired
+
+    def next_due(self):
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def pending(self):
+        with self._cond:
+            return len(self._scheduled)
+
+    # ---- service ----
+    def start(self):
+        """Load active reservations and start the worker thread (idempotent)."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+        self.resync()
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        last_resync = datetime.now()
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+                now = datetime.now()
+                if (now - last_resync).total_seconds() >= self.resync_interval:
+                    self.resync()
+                    last_resync = now
+                    continue
+            except Exception as e:
+                print(f"[EXPIRY ERROR] {e}")
+            with self._cond:
+                timeout = self.resync_interval
+                if self._heap:
+                    timeout = min(timeout, max((self._heap[0][0] - datetime.now()).total_seconds(), 0))
+                if timeout > 0 and not self._stop.is_set():
+                    self._cond.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
@@ -0,0 +1,134 @@
+#frame_ring.py
+#BuiltWithLove by @papitx0
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class FrameRing:
+    """Ring of fixed-size frame slots in shared memory, written by one process and read by another.
+
+    The writer copies each decoded frame into a free slot, stamps it with an
+    increasing sequence number and announces (slot, seq) to the reader over
+    a queue; the reader gets a numpy view of the slot (no copy, no pickling)
+    and hands it back with release() once done, including frames it skips.
+    Each header field has a single writer: the writer owns the slot's
+    sequence number, the reader its released number, and a slot is only
+    rewritten once the reader released the frame last written there, so no
+    store/load ordering between processes is relied on. When every slot is
+    still held, write() drops the frame instead of overwriting one in use.
+    Frames may be smaller than max_shape; larger ones are rejected. The
+    header also carries one value back the other way: the sampling interval
+    the reader asks for, so the writer need not decode frames that would be
+    skipped anyway.
+    """
+
+    ALIGN = 64
+
+    def __init__(self, shm, slots, max_shape, owner):
+        self.shm = shm
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.owner = owner
+        self.frame_bytes = int(np.prod(self.max_shape))
+        buf = shm.buf
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=0)  # written by the writer
+        self._released = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8 * slots)  # by the reader
+        self._times = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=16 * slots)
+        self._shapes = np.ndarray((slots, 3), dtype=np.int32, buffer=buf, offset=24 * slots)
+        self._control = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=(36 * slots + 7) // 8 * 8)
+        self._data_offset = self._header_size(slots)
+        self._next_seq = 0
+        self._cursor = 0
+
+    @classmethod
+    def _header_size(cls, slots):
+        size = (36 * slots + 7) // 8 * 8 + 8
+        return (size + cls.ALIGN - 1) // cls.ALIGN * cls.ALIGN
+
+    @classmethod
+    def create(cls, slots=8, max_shape=(720, 1280, 3)):
+        """New ring; the creating process owns it and unlinks it on close()."""
+        size = cls._header_size(slots) + slots * int(np.prod(max_shape))
+        ring = cls(shared_memory.SharedMemory(create=True, size=size), slots, max_shape, owner=True)
+        ring._seqs[:] = -1
+        ring._released[:] = -1
+        ring._control[:] = 0.0
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, max_shape):
+        """Open a ring created by another process (one started from the creator, so they share its resource tracker)."""
+        return cls(shared_memory.SharedMemory(name=name), slots, max_shape, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """(name, slots, max_shape): what another process needs to attach()."""
+        return self.name, self.slots, self.max_shape
+
+    def _slot_array(self, slot, shape):
+        offset = self._data_offset + slot * self.frame_bytes
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+
+    def _free_slot(self):
+        for offset in range(self.slots):
+            slot = (self._cursor + offset) % self.slots
+            if self._released[slot] == self._seqs[slot]:
+                return slot
+        return None
+
+    def available(self):
+        """Writer side: True if write() has a free slot (check before decoding a frame)."""
+        return self._free_slot() is not None
+
+    def write(self, frame, timestamp):
+        """Copy a uint8 frame into a free slot; returns (slot, seq), or None if the reader holds every slot."""
+        shape = frame.shape if frame.ndim == 3 else frame.shape + (1,)
+        if any(size > limit for size, limit in zip(shape, self.max_shape)):
+            raise ValueError(f"Frame {frame.shape} does not fit ring slots of {self.max_shape}")
+        slot = self._free_slot()
+        if slot is None:
+            return None
+        seq = self._next_seq
+        self._slot_array(slot, shape)[...] = frame.reshape(shape)
+        self._shapes[slot] = shape
+        self._times[slot] = timestamp
+        self._seqs[slot] = seq  # the slot is the reader's from here until release()
+        self._cursor = (slot + 1) % self.slots
+        self._next_seq += 1
+        return slot, seq
+
+    def read(self, slot, seq):
+        """(timestamp, view) of an announced frame, or None if the slot does not hold seq.
+
+        The view is not a copy; call release(slot) when done with it.
+        """
+        if self._seqs[slot] != seq:
+            return None
+        height, width, channels = (int(size) for size in self._shapes[slot])
+        view = self._slot_array(slot, (height, width, channels))
+        if channels == 1:
+            view = view[:, :, 0]
+        return float(self._times[slot]), view
+
+    def release(self, slot):
+        """Reader side: hand an announced slot back to the writer (read or skipped)."""
+        self._released[slot] = self._seqs[slot]
+
+    def request_interval(self, seconds):
+        """Reader side: ask the writer for at most one frame every `seconds` (0 = every frame)."""
+        self._control[0] = seconds
+
+    @property
+    def requested_interval(self):
+        """Writer side: seconds between frames the reader asked for."""
+        return float(self._control[0])
+
+    def close(self):
+        # Drop our numpy views first; SharedMemory refuses to close while they are exported
+        self._seqs = self._released = self._times = self._shapes = self._control = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
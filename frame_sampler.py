@@ -0,0 +1,128 @@
+#frame_sampler.py
+#BuiltWithLove by @papitx0
+import inspect
+import threading
+from collections import deque
+
+
+class FrameSampler:
+    """Decides which frames to run ANPR on, by timestamp rather than frame count.
+
+    The sampling interval is the larger of 1/target_fps and the measured
+    per-frame pipeline latency divided by cpu_budget (the share of one core
+    the camera may use), so a slow model or a busy host lowers the rate and
+    a fast one raises it back up to the target. Timestamps are seconds: wall
+    clock for live cameras, media position for video files. Thread-safe:
+    a capture thread may sample while inference threads record latency.
+    """
+
+    def __init__(self, target_fps=5.0, cpu_budget=0.5, smoothing=0.2, window=5.0):
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+        self.window = window
+        self.latency = None  # smoothed seconds per sampled frame
+        self._lock = threading.Lock()
+        self._next_due = None
+        self._seen = deque()
+        self._sampled = deque()
+        self.frames_seen = 0
+        self.frames_sampled = 0
+
+    @classmethod
+    def from_config(cls, config, camera_id=None, target_fps=None, default_fps=5.0, **overrides):
+        """Sampler from system_config.json's "frame_sampling" section, with optional per-camera overrides.
+
+        The rate comes from "cameras"[camera_id], else the camera's own
+        target_fps setting, else the section's "target_fps", else default_fps.
+        overrides (e.g. cpu_budget=None for video files) replace the section's values:
+
+        >>> config = {"frame_sampling": {"target_fps": 5, "cameras": {"gate": {"target_fps": 2}}}}
+        >>> [FrameSampler.from_config(config, camera, target_fps=10).target_fps for camera in ("gate", "lobby")]
+        [2, 10]
+        >>> FrameSampler.from_config(config, "lobby", default_fps=10).target_fps
+        5
+        """
+        options = dict(config.get("frame_sampling", {}))
+        cameras = options.pop("cameras", {})
+        options.setdefault("target_fps", default_fps)
+        if target_fps is not None:
+            options["target_fps"] = target_fps
+        options.update(overrides)
+        if camera_id is not None:
+            options.update(cameras.get(str(camera_id), {}))
+        # A typo in the config should not keep the camera from starting
+        known = set(inspect.signature(cls.__init__).parameters) - {'self'}
+        unknown = sorted(set(options) - known)
+        if unknown:
+            print(f"Ignoring unknown frame_sampling options: {', '.join(unknown)}")
+            options = {key: value for key, value in options.items() if key in known}
+        return cls(**options)
+
+    @property
+    def interval(self):
+        """Current seconds between sampled frames."""
+        interval = 1.0 / self.target_fps if self.target_fps else 0.0
+        if self.latency is not None and self.cpu_budget:
+            interval = max(interval, self.latency / self.cpu_budget)
+        return interval
+
+    @property
+    def next_due(self):
+        """Timestamp the next sampled frame is due at (None before the first one)."""
+        return self._next_due
+
+    def _trim(self, samples, timestamp):
+        samples.append(timestamp)
+        while samples and timestamp - samples[0] > self.window:
+            samples.popleft()
+
+    def should_sample(self, timestamp):
+        """True if the frame taken at `timestamp` should be processed."""
+        with self._lock:
+            return self._should_sample(timestamp)
+
+    def _should_sample(self, timestamp):
+        self.frames_seen += 1
+        self._trim(self._seen, timestamp)
+        # Small tolerance so a 10 fps target on a 30 fps feed doesn't slip a frame to rounding
+        if self._next_due is not None and timestamp < self._next_due - 0.001:
+            return False
+        interval = self.interval
+        if self._next_due is None or timestamp - self._next_due > interval:
+            self._next_due = timestamp + interval  # fell behind (or first frame): restart the schedule
+        else:
+            self._next_due += interval
+        self.frames_sampled += 1
+        self._trim(self._sampled, timestamp)
+        return True
+
+    def record_latency(self, seconds):
+        """Feed back how long the sampled frame took to process end to end."""
+        with self._lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.smoothing * (seconds - self.latency)
+
+    @staticmethod
+    def _rate(samples):
+        if len(samples) < 2 or samples[-1] <= samples[0]:
+            return 0.0
+        return (len(samples) - 1) / (samples[-1] - samples[0])
+
+    def stats(self):
+        """Source and processed frame rates over the last `window` seconds, plus the current interval."""
+        with self._lock:
+            source_fps = self._rate(self._seen)
+            effective_fps = self._rate(self._sampled)
+        return {
+            'target_fps': self.target_fps,
+            'source_fps': round(source_fps, 1),
+            'effective_fps': round(effective_fps, 1),
+            'stride': round(source_fps / effective_fps, 1) if effective_fps else 0.0,
+            'interval_ms': round(self.interval * 1000, 1),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else 0.0,
+            'frames_seen': self.frames_seen,
+            'frames_sampled': self.frames_sampled,
+        }
@@ -0,0 +1,126 @@
+#inference_service.py
+#BuiltWithLove by @papitx0
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+def plates_from_result(result, confidence_threshold):
+    """Plate boxes [{'bbox', 'confidence'}] from one ultralytics result."""
+    plates = []
+    boxes = result.boxes
+    if boxes is not None:
+        for box in boxes:
+            confidence = float(box.conf[0])
+            if confidence >= confidence_threshold:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                plates.append({
+                    'bbox': (x1, y1, x2, y2),
+                    'confidence': confidence
+                })
+    return plates
+
+
+class BatchedDetector:
+    """One YOLO model shared by every camera loop, run on micro-batches of frames.
+
+    Callers block in detect() while a worker thread groups pending frames
+    (same input size and threshold) into one model call of up to max_batch
+    images. With more than one registered camera the worker waits up to
+    max_wait seconds for a batch to fill; a single camera is never delayed.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, model_path="yolov8n.pt", max_batch=8, max_wait=0.02):
+        """Return the shared detector for a model file, loading the model on first use."""
+        with cls._instances_lock:
+            if model_path not in cls._instances:
+                from ultralytics import YOLO
+                cls._instances[model_path] = cls(YOLO(model_path), max_batch, max_wait)
+            return cls._instances[model_path]
+
+    def __init__(self, model, max_batch=8, max_wait=0.02):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._clients = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.frames = 0
+        self.busy_seconds = 0.0
+
+    def register(self):
+        """Announce a camera loop that will submit frames (enables waiting for fuller batches)."""
+        with self._lock:
+            self._clients += 1
+
+    def unregister(self):
+        with self._lock:
+            self._clients = max(self._clients - 1, 0)
+
+    def submit(self, image, confidence_threshold, imgsz=None):
+        future = Future()
+        self._queue.put((image, confidence_threshold, imgsz, future))
+        self._start()
+        return future
+
+    def detect(self, image, confidence_threshold, imgsz=None):
+        """Plate boxes for one image; blocks until its batch has run."""
+        return self.submit(image, confidence_threshold, imgsz).result()
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + (self.max_wait if self._clients > 1 else 0)
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # One model call per (input size, threshold) group
+            groups = {}
+            for request in batch:
+                key = (tuple(request[2]) if isinstance(request[2], list) else request[2], request[1])
+                groups.setdefault(key, []).append(request)
+            for (imgsz, confidence_threshold), requests in groups.items():
+                options = {'imgsz': list(imgsz) if isinstance(imgsz, tuple) else imgsz} if imgsz is not None else {}
+                start = time.perf_counter()
+                try:
+                    results = self.model([request[0] for request in requests], conf=confidence_threshold,
+                                         verbose=False, **options)
+                    for request, result in zip(requests, results):
+                        request[3].set_result(plates_from_result(result, confidence_threshold))
+                except Exception as e:
+                    for request in requests:
+                        if not request[3].done():
+                            request[3].set_exception(e)
+                self.busy_seconds += time.perf_counter() - start
+                self.batches += 1
+                self.frames += len(requests)
+
+    def stats(self):
+        return {
+            'cameras': self._clients,
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch': round(self.frames / self.batches, 2) if self.batches else 0.0,
+            'fps_per_busy_second': round(self.frames / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+        }
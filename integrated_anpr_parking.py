@@ -6,14 +6,22 @@ import easyocr
 import re
 from datetime import datetime
 import os
+import json
 import logging
-from ultralytics import YOLO
 import time
 import streamlit as st
+from storage import open_storage
+from ocr_strategy import OCRStrategy
+from plate_tracker import PlateTracker
+from motion_gate import MotionGate
+from camera_roi import CameraROI, stride_aligned_size
+from inference_service import BatchedDetector
+from frame_sampler import FrameSampler
 
 
 class ANPRSystem:
-    def __init__(self, yolo_model_path="yolov8n.pt", confidence_threshold=0.7, ocr_confidence_threshold=0.6):
+    def __init__(self, yolo_model_path="yolov8n.pt", confidence_threshold=0.7, ocr_confidence_threshold=0.6,
+                 ocr_workers=0, detect_scale=None):
         """
         Initialize ANPR System
 
@@ -21,14 +29,18 @@ class ANPRSystem:
             yolo_model_path: Path to YOLO model for license plate detection
             confidence_threshold: Minimum confidence for plate detection
             ocr_confidence_threshold: Minimum confidence for OCR text recognition
+            ocr_workers: Threads for evaluating OCR variants concurrently (0 = one after another)
+            detect_scale: Run YOLO on a copy of the frame scaled by this factor; OCR still reads the
+                full-resolution frame (default: "detect_scale" in system_config.json, else 1.0)
         """
         # Setup logging
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
 
-        # Initialize YOLO model
+        # Initialize YOLO model (one batched instance shared by every camera in this process)
         try:
-            self.yolo_model = YOLO(yolo_model_path)
+            self.detector = BatchedDetector.open(yolo_model_path)
+            self.yolo_model = self.detector.model
             self.logger.info(f"YOLO model loaded: {yolo_model_path}")
         except Exception as e:
             self.logger.error(f"Failed to load YOLO model: {e}")
@@ -46,10 +58,28 @@ class ANPRSystem:
         self.confidence_threshold = confidence_threshold
         self.ocr_confidence_threshold = ocr_confidence_threshold
 
+        # OCR passes over each plate crop, tried best-yielding first until one is accepted
+        self.ocr_strategy = OCRStrategy(
+            self.ocr_reader,
+            variants=[
+                ('original', lambda img: img),
+                ('enhanced', self._enhance_plate_image),
+                ('upscaled', lambda img: cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)),
+            ],
+            accept=self._accept_read,
+            workers=ocr_workers
+        )
+
         # Create parking_data folder if it doesn't exist
         self.data_folder = "parking_data"
         os.makedirs(self.data_folder, exist_ok=True)
-        self.csv_file = os.path.join(self.data_folder, "anpr_detections.csv")
+        # Detections go to the web app's storage backend, opened on first use
+        self.storage_backend = os.getenv("SMARTPARK_STORAGE", "csv")
+        self._storage = None
+
+        if detect_scale is None:
+            detect_scale = float(self.load_system_config().get("detect_scale", 1.0))
+        self.detect_scale = detect_scale
 
         # Emergency vehicle patterns (can be customized)
         self.emergency_patterns = [
@@ -67,18 +97,7 @@ class ANPRSystem:
             r'^[A-Z]{3}\d{3}$',  # Format: ABC123
         ]
 
-        # Initialize CSV file
-        self._initialize_csv()
-
-    def _initialize_csv(self):
-        """Initialize CSV file with headers if it doesn't exist"""
-        if not os.path.exists(self.csv_file):
-            df = pd.DataFrame(
-                columns=['id', 'plate_number', 'confidence', 'detection_time', 'is_emergency', 'processed'])
-            df.to_csv(self.csv_file, index=False)
-            self.logger.info(f"Created CSV file: {self.csv_file}")
-        else:
-            self.logger.info(f"Using existing CSV file: {self.csv_file}")
+        self.logger.info(f"Saving detections to the {self.storage_backend} storage in: {self.data_folder}")
 
     def _clean_plate_text(self, text):
         """Clean and normalize license plate text"""
@@ -151,87 +170,212 @@ class ANPRSystem:
 
         return morphed
 
-    def detect_plates(self, image):
-        """Detect license plates in the image using YOLO"""
-        results = self.yolo_model(image, conf=self.confidence_threshold)
-        plates = []
-
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    confidence = float(box.conf[0])
-                    if confidence >= self.confidence_threshold:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        plates.append({
-                            'bbox': (x1, y1, x2, y2),
-                            'confidence': confidence
-                        })
+    def detect_plates(self, image, imgsz=None):
+        """Detect license plates in the image using YOLO (imgsz overrides the model input size)
 
+        Frames from concurrent camera loops are batched into one model call by the shared detector.
+        """
+        return self.detector.detect(image, self.confidence_threshold, imgsz=imgsz)
+
+    def _accept_read(self, text, confidence):
+        """True when an OCR read is good enough to stop trying other variants"""
+        return confidence >= self.ocr_confidence_threshold and self._validate_plate(self._clean_plate_text(text))
+
+    def detect_plates_scaled(self, image, scale=None, imgsz=None):
+        """Run YOLO on a downscaled copy of image and return boxes in image coordinates"""
+        scale = self.detect_scale if scale is None else scale
+        if scale >= 1.0:
+            return self.detect_plates(image, imgsz=imgsz)
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        plates = self.detect_plates(small, imgsz=stride_aligned_size(small.shape))
+        height, width = image.shape[:2]
+        for plate in plates:
+            x1, y1, x2, y2 = plate['bbox']
+            plate['bbox'] = (int(x1 / scale), int(y1 / scale),
+                             min(int(round(x2 / scale)), width), min(int(round(y2 / scale)), height))
         return plates
 
-    def extract_text(self, plate_image):
-        """Extract text from license plate using EasyOCR with multiple attempts"""
-        best_text = ""
-        best_confidence = 0
-
-        # Try with original image
-        results = self.ocr_reader.readtext(plate_image)
-        for (bbox, text, confidence) in results:
-            if confidence > best_confidence and len(text.strip()) >= 4:
-                best_text = text.strip()
-                best_confidence = confidence
-
-        # Try with enhanced image
-        enhanced_img = self._enhance_plate_image(plate_image)
-        enhanced_results = self.ocr_reader.readtext(enhanced_img)
-        for (bbox, text, confidence) in enhanced_results:
-            if confidence > best_confidence and len(text.strip()) >= 4:
-                best_text = text.strip()
-                best_confidence = confidence
-
-        # Try with different preprocessing
-        resized = cv2.resize(plate_image, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-        resized_results = self.ocr_reader.readtext(resized)
-        for (bbox, text, confidence) in resized_results:
-            if confidence > best_confidence and len(text.strip()) >= 4:
-                best_text = text.strip()
-                best_confidence = confidence
-
-        return best_text, best_confidence
+    def benchmark_scales(self, image_paths, scales=(1.0, 0.75, 0.5, 0.35), expected=None, repeats=3):
+        """Compare detection latency and plate reads across detection scales.
+
+        expected maps image path -> true plate; without it the reads at the first
+        scale are the reference. Returns one row per scale.
+        """
+        images = [(path, cv2.imread(path)) for path in image_paths]
+        images = [(path, image) for path, image in images if image is not None]
+        if not images:
+            return []
+        original_scale = self.detect_scale
+        rows = []
+        reference = dict(expected or {})
+        try:
+            for scale in scales:
+                self.detect_scale = scale
+                latencies, total_ms, matched, plates_found = [], 0.0, 0, 0
+                for path, image in images:
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        self.detect_plates_scaled(image)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    start = time.perf_counter()
+                    reads = [d['plate_number'] for d in self.process_frame(image)]
+                    total_ms += (time.perf_counter() - start) * 1000
+                    plates_found += len(reads)
+                    if expected is None and not rows:
+                        reference[path] = reads[0] if reads else None
+                    if reference.get(path) is not None and reference[path] in reads:
+                        matched += 1
+                labelled = sum(1 for path, _ in images if reference.get(path) is not None)
+                rows.append({
+                    'scale': scale,
+                    'detect_ms': round(sorted(latencies)[len(latencies) // 2], 1),
+                    'pipeline_ms': round(total_ms / len(images), 1),
+                    'plates_found': plates_found,
+                    'accuracy': round(matched / labelled, 3) if labelled else None,
+                })
+        finally:
+            self.detect_scale = original_scale
+        return rows
+
+    def extract_text(self, plate_image, single_pass=False):
+        """Extract text from license plate using EasyOCR, stopping at the first good read"""
+        return self.ocr_strategy.run(plate_image, max_variants=1 if single_pass else None)
+
+    def extract_text_batch(self, plate_images, single_pass=False):
+        """extract_text() for several crops at once; [(text, confidence), ...] in input order"""
+        if not plate_images:
+            return []
+        return self.ocr_strategy.run_batch(plate_images, max_variants=1 if single_pass else None)
+
+    def load_system_config(self):
+        """Contents of system_config.json in the data folder ({} if missing or unreadable)"""
+        try:
+            with open(os.path.join(self.data_folder, "system_config.json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def create_motion_gate(self, camera_id=None):
+        """MotionGate configured from system_config.json ("motion_gate"), or None if disabled there"""
+        config = self.load_system_config()
+        gate = MotionGate.from_config(config, camera_id)
+        if gate is not None and gate.region is None:
+            # Without an explicit motion region, watch the camera's lane ROI
+            roi = CameraROI.from_config(config, camera_id)
+            if roi is not None:
+                gate.region = roi.bounds()
+        return gate
+
+    def create_roi(self, camera_id=None):
+        """Lane ROI for a camera from system_config.json ("camera_rois"), or None for the full frame"""
+        if camera_id is None:
+            return None
+        return CameraROI.from_config(self.load_system_config(), camera_id)
+
+    def create_sampler(self, camera_id=None, target_fps=None, default_fps=5.0, **overrides):
+        """FrameSampler from system_config.json ("frame_sampling"); target_fps is the camera's own setting,
+        default_fps the rate used when neither it nor the config sets one"""
+        return FrameSampler.from_config(self.load_system_config(), camera_id, target_fps=target_fps,
+                                        default_fps=default_fps, **overrides)
+
+    def create_tracker(self, **options):
+        """PlateTracker that confirms plates by multi-frame vote, validated with this system's rules"""
+        return PlateTracker(validate=self._validate_plate, **options)
+
+    def get_ocr_stats(self):
+        """Per-variant OCR statistics (attempts, accepted reads, hit rate, average time)"""
+        return self.ocr_strategy.stats()
 
     def process_image(self, image_path):
-        """Process a single image for ANPR"""
+        """Process a single image file for ANPR"""
+        image = cv2.imread(image_path)
+        if image is None:
+            self.logger.error(f"Could not load image: {image_path}")
+            return []
+        return self.process_frame(image)
+
+    def process_frame(self, frame, return_crops=False, tracker=None, gate=None, roi=None):
+        """Run detection and OCR on an in-memory BGR frame (numpy array).
+
+        With return_crops=True each detection carries 'plate_image', a view into
+        frame (no copy); copy it before drawing on the frame if you keep it.
+        With a PlateTracker, boxes are matched to tracks and every frame adds a
+        cheap single-pass OCR read to its track's vote. A plate is only reported
+        once the vote is stable; after that OCR is skipped except for periodic
+        re-verification. Detections then carry 'track_id' and 'ocr_skipped'.
+        With a MotionGate, frames where the watched region did not change are
+        skipped without running YOLO (unless a tracked plate is still unread).
+        With a CameraROI, YOLO only sees the lane crop; boxes are still returned
+        in full-frame coordinates and OCR reads the full-resolution frame.
+        YOLO runs at detect_scale; crops for OCR always come from the original frame.
+        """
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                self.logger.error(f"Could not load image: {image_path}")
-                return []
+            if gate is not None:
+                pending = tracker is not None and tracker.has_pending()
+                if not gate.should_process(frame, force=pending):
+                    return []
+            inference_start = time.perf_counter()
 
             # Detect license plates
-            plates = self.detect_plates(image)
+            if roi is not None:
+                crop, offset, imgsz = roi.crop(frame)
+                plates = roi.to_frame(self.detect_plates_scaled(crop, imgsz=imgsz), offset)
+            else:
+                plates = self.detect_plates_scaled(frame)
             detections = []
+            height, width = frame.shape[:2]
 
-            for plate_info in plates:
+            if tracker is not None:
+                assigned = tracker.update(plates)
+            else:
+                assigned = [(None, plate_info) for plate_info in plates]
+
+            # Collect every crop of the frame first so OCR runs as one batch, not once per box
+            candidates = []
+            for track, plate_info in assigned:
                 x1, y1, x2, y2 = plate_info['bbox']
-                detection_confidence = plate_info['confidence']
 
-                # Extract plate region
-                plate_img = image[y1:y2, x1:x2]
+                # Extract plate region (a view; clamp so negative coords don't wrap around)
+                x1, y1 = max(x1, 0), max(y1, 0)
+                x2, y2 = min(x2, width), min(y2, height)
+                plate_img = frame[y1:y2, x1:x2]
 
                 if plate_img.size == 0:
                     continue
+                candidates.append((track, plate_info['confidence'], (x1, y1, x2, y2), plate_img))
+
+            # One cheap pass for tracked boxes (the track's vote decides the plate), all variants otherwise
+            tracked = [c for c in candidates if c[0] is not None and tracker.needs_ocr(c[0])]
+            untracked = [c for c in candidates if c[0] is None]
+            reads = {}
+            for group, single_pass in ((tracked, True), (untracked, False)):
+                texts = self.extract_text_batch([c[3] for c in group], single_pass=single_pass)
+                for candidate, read in zip(group, texts):
+                    reads[id(candidate)] = read
+
+            for candidate in candidates:
+                track, detection_confidence, bbox, plate_img = candidate
+                ocr_skipped = False
+                if track is not None:
+                    if id(candidate) in reads:
+                        raw_read, read_confidence = reads[id(candidate)]
+                        tracker.record_read(track, self._clean_plate_text(raw_read), raw_read, read_confidence)
+                    else:
+                        tracker.ocr_skipped += 1
+                        ocr_skipped = True
+                    if not track.confirmed:
+                        continue
+                    plate_text, ocr_confidence = track.raw_text, track.ocr_confidence
+                    cleaned_text = track.plate_number
+                else:
+                    plate_text, ocr_confidence = reads[id(candidate)]
 
-                # Extract text
-                plate_text, ocr_confidence = self.extract_text(plate_img)
-
-                # Clean and validate
-                cleaned_text = self._clean_plate_text(plate_text)
+                    # Clean and validate
+                    cleaned_text = self._clean_plate_text(plate_text)
 
-                if (ocr_confidence >= self.ocr_confidence_threshold and
-                        self._validate_plate(cleaned_text) and
-                        len(cleaned_text) >= 4):
+                # A confirmed track already passed the multi-frame vote and validation, not the confidence floor
+                if ocr_confidence >= self.ocr_confidence_threshold and \
+                        (track is not None or (self._validate_plate(cleaned_text) and len(cleaned_text) >= 4)):
                     # Calculate combined confidence
                     combined_confidence = (detection_confidence + ocr_confidence) / 2
 
@@ -240,19 +384,27 @@ class ANPRSystem:
                         'confidence': round(combined_confidence, 3),
                         'detection_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                         'is_emergency': self._is_emergency_vehicle(cleaned_text),
-                        'bbox': (x1, y1, x2, y2),
+                        'bbox': bbox,
                         'raw_text': plate_text,
                         'ocr_confidence': round(ocr_confidence, 3),
                         'detection_confidence': round(detection_confidence, 3)
                     }
+                    if return_crops:
+                        detection['plate_image'] = plate_img
+                    if track is not None:
+                        detection['track_id'] = track.track_id
+                        detection['ocr_skipped'] = ocr_skipped
 
                     detections.append(detection)
-                    self.logger.info(f"Detected plate: {cleaned_text} (confidence: {combined_confidence:.3f})")
+                    if not ocr_skipped:
+                        self.logger.info(f"Detected plate: {cleaned_text} (confidence: {combined_confidence:.3f})")
 
+            if gate is not None:
+                gate.record_inference(time.perf_counter() - inference_start)
             return detections
 
         except Exception as e:
-            self.logger.error(f"Error processing image {image_path}: {e}")
+            self.logger.error(f"Error processing frame: {e}")
             return []
 
     def process_camera(self, camera_id=0, display_window=True, save_detections=True, record_video=False,
@@ -282,28 +434,41 @@ class ANPRSystem:
         all_detections = []
         last_detection_time = {}  # Track last detection time for each plate
         detection_cooldown = 5  # Seconds between saving same plate
+        tracker = self.create_tracker()  # OCR each vehicle until its plate is agreed, not every frame
+        self.detector.register()
+        gate = self.create_motion_gate(camera_id)  # skip YOLO while the lane is static
+        roi = self.create_roi(camera_id)  # run YOLO on the lane strip only
+        sampler = self.create_sampler(camera_id, default_fps=10)  # rate adapts to measured pipeline latency
 
         self.logger.info(
             "Starting live camera processing. Press 'q' to quit, 's' to save screenshot, 'r' to reset detections")
 
+        # Without a window or recording, frames the sampler skips are grabbed but never decoded
+        decode_all = display_window or out is not None
+
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                if not cap.grab():
                     self.logger.error("Failed to read frame from camera")
                     break
 
                 frame_count += 1
                 current_time = time.time()
+                # Process frames at the sampler's rate, not a fixed stride
+                sample = sampler.should_sample(current_time)
+                if not (sample or decode_all):
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    self.logger.error("Failed to read frame from camera")
+                    break
+                if frame_count == 1 and roi is not None:
+                    self.logger.info(f"Camera ROI: detector input {roi.input_ratio(frame.shape)}x smaller")
 
-                # Process every 3rd frame for real-time performance
-                if frame_count % 3 == 0:
-                    # Save frame temporarily
-                    temp_frame_path = "temp_camera_frame.jpg"
-                    cv2.imwrite(temp_frame_path, frame)
-
+                if sample:
                     # Process frame
-                    detections = self.process_image(temp_frame_path)
+                    started = time.perf_counter()
+                    detections = self.process_frame(frame, tracker=tracker, gate=gate, roi=roi)
 
                     # Filter detections based on cooldown period
                     valid_detections = []
@@ -323,6 +488,7 @@ class ANPRSystem:
                                 self.save_detections([detection])
 
                     all_detections.extend(valid_detections)
+                    sampler.record_latency(time.perf_counter() - started)
 
                     # Draw all current detections on frame
                     for detection in detections:
@@ -353,12 +519,11 @@ class ANPRSystem:
                         cv2.putText(frame, confidence_label, (x1, y1 - 5),
                                     cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
 
-                    # Clean up temp file
-                    if os.path.exists(temp_frame_path):
-                        os.remove(temp_frame_path)
-
                 # Add info overlay
                 info_text = f"Detections: {len(all_detections)} | Frame: {frame_count} | Press 'q' to quit"
+                if gate is not None:
+                    info_text += f" | Idle skipped: {gate.frames_skipped}"
+                info_text += f" | ANPR: {sampler.stats()['effective_fps']} fps"
                 cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
                 # Add timestamp
@@ -399,6 +564,7 @@ class ANPRSystem:
             self.logger.error(f"Error during camera processing: {e}")
         finally:
             # Cleanup
+            self.detector.unregister()
             cap.release()
             if out is not None:
                 out.release()
@@ -406,15 +572,26 @@ class ANPRSystem:
                 cv2.destroyAllWindows()
 
         self.logger.info(f"Camera processing completed. Total detections: {len(all_detections)}")
+        if gate is not None:
+            self.logger.info(f"Motion gate: {gate.stats()}")
         return all_detections
 
-    def process_video(self, video_path, output_video_path=None, save_detections=True):
-        """Process video file for ANPR"""
+    def process_video(self, video_path, output_video_path=None, save_detections=True, display=True,
+                      start_frame=0, end_frame=None, seek_seconds=2.0):
+        """Process video file for ANPR
+
+        display=False runs headless; start_frame/end_frame limit processing to a range of the file
+        (used by video_batch to split long footage across processes). Headless without an output
+        video, frames between samples are skipped without decoding, or seeked over when the next
+        sample is more than seek_seconds ahead.
+        """
         cap = cv2.VideoCapture(video_path)
 
         if not cap.isOpened():
             self.logger.error(f"Cannot open video file: {video_path}")
             return []
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
 
         if output_video_path:
             # Setup video writer
@@ -424,29 +601,54 @@ class ANPRSystem:
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
 
-        frame_count = 0
+        frame_count = start_frame
         all_detections = []
+        tracker = self.create_tracker()
+        gate = self.create_motion_gate()
+        # Paced by media time at a fixed rate: what gets read must not depend on how fast or busy the host is
+        sampler = self.create_sampler(default_fps=6, cpu_budget=None)
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        decode_all = display or bool(output_video_path)
+        seekable = not decode_all
+
+        while end_frame is None or frame_count < end_frame:
+            # Far from the next sample: jump there instead of grabbing every frame in between
+            if seekable and sampler.next_due is not None and \
+                    sampler.next_due - frame_count / video_fps > seek_seconds:
+                if end_frame is not None and sampler.next_due * video_fps >= end_frame:
+                    break
+                if cap.set(cv2.CAP_PROP_POS_MSEC, sampler.next_due * 1000) and \
+                        int(cap.get(cv2.CAP_PROP_POS_FRAMES)) > frame_count:
+                    frame_count = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                    continue
+                # The seek failed or went nowhere (past the end, or back to the same keyframe): read on instead
+                seekable = False
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+            if not cap.grab():
                 break
 
             frame_count += 1
 
-            # Process every 5th frame to improve performance
-            if frame_count % 5 == 0:
-                # Save frame temporarily
-                temp_frame_path = "temp_frame.jpg"
-                cv2.imwrite(temp_frame_path, frame)
-
+            # Sample by position in the video rather than every Nth frame
+            position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or frame_count / video_fps
+            sample = sampler.should_sample(position)
+            if not (sample or decode_all):
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            if sample:
                 # Process frame
-                detections = self.process_image(temp_frame_path)
+                started = time.perf_counter()
+                detections = self.process_frame(frame, tracker=tracker, gate=gate)
+                sampler.record_latency(time.perf_counter() - started)
 
-                # Add frame info to detections
+                # Add frame info to detections (one entry per newly read vehicle)
                 for detection in detections:
                     detection['frame'] = frame_count
-                    all_detections.append(detection)
+                    detection['video_time'] = round(position, 2)
+                    if not detection['ocr_skipped']:
+                        all_detections.append(detection)
 
                 # Draw detections on frame
                 for detection in detections:
@@ -460,23 +662,21 @@ class ANPRSystem:
 
                     cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
-                # Clean up
-                if os.path.exists(temp_frame_path):
-                    os.remove(temp_frame_path)
-
             # Write frame to output video
             if output_video_path:
                 out.write(frame)
 
             # Display frame (optional)
-            cv2.imshow('ANPR System', cv2.resize(frame, (800, 600)))
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            if display:
+                cv2.imshow('ANPR System', cv2.resize(frame, (800, 600)))
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
 
         cap.release()
         if output_video_path:
             out.release()
-        cv2.destroyAllWindows()
+        if display:
+            cv2.destroyAllWindows()
 
         # Save detections
         if save_detections and all_detections:
@@ -484,41 +684,25 @@ class ANPRSystem:
 
         return all_detections
 
+    @property
+    def storage(self):
+        """Storage backend selected by SMARTPARK_STORAGE, the same one the web app reads detections from"""
+        if self._storage is None:
+            self._storage = open_storage(self.storage_backend, self.data_folder)
+        return self._storage
+
     def save_detections(self, detections):
-        """Save detections to CSV file"""
+        """Append detections to the storage backend (CSV segments are written to disk within a second)"""
         try:
-            # Load existing data
-            if os.path.exists(self.csv_file):
-                existing_df = pd.read_csv(self.csv_file)
-                next_id = existing_df['id'].max() + 1 if not existing_df.empty else 1
-            else:
-                existing_df = pd.DataFrame()
-                next_id = 1
-
-            # Prepare new data
-            new_data = []
-            for detection in detections:
-                new_data.append({
-                    'id': next_id,
-                    'plate_number': detection['plate_number'],
-                    'confidence': detection['confidence'],
-                    'detection_time': detection['detection_time'],
-                    'is_emergency': detection['is_emergency'],
-                    'processed': False
-                })
-                next_id += 1
-
-            # Create DataFrame and append
-            new_df = pd.DataFrame(new_data)
-            final_df = pd.concat([existing_df, new_df], ignore_index=True)
-
-            # Remove duplicates based on plate number and time (within 5 seconds)
-            final_df['detection_time'] = pd.to_datetime(final_df['detection_time'])
-            final_df = final_df.sort_values('detection_time')
-
-            # Save to CSV
-            final_df.to_csv(self.csv_file, index=False)
-            self.logger.info(f"Saved {len(new_data)} detections to {self.csv_file}")
+            self.storage.insert_detections([{
+                'plate_number': detection['plate_number'],
+                'confidence': detection['confidence'],
+                'detection_time': detection['detection_time'],
+                'camera_location': detection.get('camera_location', ''),
+                'is_emergency': detection['is_emergency'],
+                'processed': False
+            } for detection in detections])
+            self.logger.info(f"Saved {len(detections)} detections")
 
         except Exception as e:
             self.logger.error(f"Error saving detections: {e}")
@@ -526,7 +710,7 @@ class ANPRSystem:
     def get_detection_stats(self):
         """Get statistics from detection database"""
         try:
-            df = pd.read_csv(self.csv_file)
+            df = self.storage.load_detections()
             stats = {
                 'total_detections': len(df),
                 'emergency_vehicles': len(df[df['is_emergency'] == True]),
@@ -544,26 +728,20 @@ class ANPRSystem:
 def _activate_reservation_from_anpr(db, reservation):
     """Activate a reservation when ANPR detects the vehicle."""
     try:
-        # Get the current reservations data
-        df = db.get_reservations_history()
-
-        # Find the specific reservation to activate
-        mask = (df['plate_number'].str.upper() == reservation['plate_number'].upper()) & \
-               (df['created_at'] == reservation['created_at'])
-
         # Update reservation status and timing
         now = datetime.now()
         end_time = now + pd.Timedelta(minutes=reservation['duration_minutes'])
 
-        df.loc[mask, 'status'] = 'active'
-        df.loc[mask, 'start_time'] = now.strftime('%Y-%m-%d %H:%M:%S')
-        df.loc[mask, 'end_time'] = end_time.strftime('%Y-%m-%d %H:%M:%S')
+        with db.transaction():
+            db.update_reservation(
+                reservation['id'],
+                status='active',
+                start_time=now.strftime('%Y-%m-%d %H:%M:%S'),
+                end_time=end_time.strftime('%Y-%m-%d %H:%M:%S')
+            )
 
-        # Update spot status to occupied
-        db.update_spot_status(reservation['spot_id'], 'occupied')
-
-        # Save the updated reservations
-        df.to_csv(db.reservations_file, index=False)
+            # Update spot status to occupied
+            db.update_spot_status(reservation['spot_id'], 'occupied')
 
         return True
 
@@ -585,10 +763,11 @@ def main():
     print("2. Process Image")
     print("3. Process Video")
     print("4. View Detection Statistics")
-    print("5. Exit")
+    print("5. Benchmark Detection Scales")
+    print("6. Exit")
 
     while True:
-        choice = input("\nEnter your choice (1-5): ").strip()
+        choice = input("\nEnter your choice (1-6): ").strip()
 
         if choice == '1':
             # Live camera processing
@@ -644,6 +823,15 @@ def main():
             # Process video
             video_path = input("Enter video path: ").strip()
             if os.path.exists(video_path):
+                if input("Headless parallel batch for long footage? (y/n): ").strip().lower() == 'y':
+                    # Chunks run in a process pool with their own models; resumes if interrupted
+                    from video_batch import process_video_parallel
+                    try:
+                        detections = process_video_parallel(video_path, data_folder=anpr.data_folder)
+                        print(f"Processed video with {len(detections)} total detections")
+                        continue
+                    except ValueError as e:
+                        print(f"{e}; processing it in one pass instead")
                 save_output = input("Save annotated video? (y/n): ").strip().lower() == 'y'
                 output_path = None
                 if save_output:
@@ -670,22 +858,45 @@ def main():
                 print(f"Average confidence: {stats['average_confidence']:.3f}")
                 print(f"Latest detection: {stats['latest_detection']}")
 
-                # Show recent detections
-                if os.path.exists(anpr.csv_file):
-                    df = pd.read_csv(anpr.csv_file)
-                    if not df.empty:
-                        print("\n=== Recent Detections ===")
-                        recent = df.tail(10)[['plate_number', 'confidence', 'detection_time', 'is_emergency']]
-                        print(recent.to_string(index=False))
+                # Show what each OCR pass contributed in this session
+                print("\n=== OCR Variants ===")
+                for name, ocr in anpr.get_ocr_stats().items():
+                    print(f"{name}: {ocr['attempts']} attempts, {ocr['accepted']} accepted "
+                          f"({ocr['hit_rate']:.0%}), {ocr['avg_ms']} ms avg")
+
+                # Show recent detections (today's segment only)
+                df = anpr.detections.read(since=datetime.now().date())
+                if not df.empty:
+                    print("\n=== Recent Detections ===")
+                    recent = df.tail(10)[['plate_number', 'confidence', 'detection_time', 'is_emergency']]
+                    print(recent.to_string(index=False))
             else:
                 print("No detection data available")
 
         elif choice == '5':
+            # Benchmark detection scales on sample images
+            folder = input("Enter folder with sample images: ").strip()
+            if os.path.isdir(folder):
+                paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                         if name.lower().endswith(('.jpg', '.jpeg', '.png'))]
+                # Images named after their plate (e.g. ABC123.jpg) are scored against that plate
+                expected = {path: os.path.splitext(os.path.basename(path))[0].upper() for path in paths}
+                if not all(anpr._validate_plate(plate) for plate in expected.values()):
+                    expected = None
+                print(f"Benchmarking {len(paths)} images...")
+                for row in anpr.benchmark_scales(paths, expected=expected):
+                    accuracy = f"{row['accuracy']:.0%}" if row['accuracy'] is not None else "n/a"
+                    print(f"  scale {row['scale']:.2f}: detect {row['detect_ms']} ms, "
+                          f"full pipeline {row['pipeline_ms']} ms, plates {row['plates_found']}, accuracy {accuracy}")
+            else:
+                print("Folder not found!")
+
+        elif choice == '6':
             print("Exiting...")
             break
 
         else:
-            print("Invalid choice. Please enter 1-5.")
+            print("Invalid choice. Please enter 1-6.")
 
 
 # Simple camera test function
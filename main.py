@@ -3,8 +3,64 @@
 import subprocess
 import sys
 
+# Modules the dashboard should never import at startup (they belong to ANPR / model training)
+HEAVY_MODULES = ("torch", "ultralytics", "easyocr", "cv2", "sklearn")
+
+
 def run_streamlit():
     subprocess.run([sys.executable, "-m", "streamlit", "run", "entrypoint.py"])
 
+
+def import_report(module="entrypoint", budget=None, top=15):
+    """Import `module` in a fresh interpreter with -X importtime and summarize the cost.
+
+    Prints the slowest direct imports and any heavy ML module that got loaded.
+    Returns 1 if a heavy module was imported or the total exceeds `budget` seconds.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    records = []  # (depth, name, cumulative_us) in the order Python reports them
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((depth, name.strip(), int(parts[1])))
+
+    # Children are reported before their parent; collect what `module` pulled in directly
+    total, children = 0, {}
+    for index, (depth, name, cumulative) in enumerate(records):
+        if depth == 0 and name == module:
+            total = cumulative
+            for child_depth, child, child_cumulative in reversed(records[:index]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children[child] = child_cumulative
+
+    print(f"Import of '{module}': {total / 1e6:.2f}s")
+    for name, cumulative in sorted(children.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {cumulative / 1e6:7.3f}s  {name}")
+
+    heavy = sorted(name for _, name, _ in records if name in HEAVY_MODULES)
+    failed = False
+    if heavy:
+        print(f"Heavy modules loaded at startup: {', '.join(heavy)}")
+        failed = True
+    if budget is not None and total / 1e6 > budget:
+        print(f"Over budget: {total / 1e6:.2f}s > {budget:.2f}s")
+        failed = True
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "Import failed")
+        failed = True
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    run_streamlit()
\ No newline at end of file
+    if "--import-report" in sys.argv:
+        # python main.py --import-report [budget_seconds]
+        args = [a for a in sys.argv[1:] if a != "--import-report"]
+        sys.exit(import_report(budget=float(args[0]) if args else None))
+    run_streamlit()
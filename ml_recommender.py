@@ -6,13 +6,19 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
+from storage import ReservationJournal
 
 def train_spot_recommender(csv_path="parking_data/reservations_history.csv"):
     if not os.path.exists(csv_path):
         print("❌ ERROR: File not found:", csv_path)
         return
 
-    df = pd.read_csv(csv_path)
+    # Recent reservations may still be in the journal, not yet folded into the CSV snapshot
+    journal_path = os.path.join(os.path.dirname(csv_path), "reservations_journal.jsonl")
+    if os.path.exists(journal_path):
+        df = ReservationJournal.open(csv_path, journal_path).to_frame()
+    else:
+        df = pd.read_csv(csv_path)
 
     if df.empty:
         print("⚠️ CSV is empty. Add data to reservations_history.csv first.")
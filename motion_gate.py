@@ -0,0 +1,101 @@
+#motion_gate.py
+#BuiltWithLove by @papitx0
+import inspect
+import time
+import cv2
+
+
+class MotionGate:
+    """Cheap scene-change check that decides whether a frame is worth running YOLO on.
+
+    Each frame is shrunk to `scale_width` pixels wide, blurred and compared with
+    a slowly updated background. The gate opens when more than `threshold` of
+    the pixels inside `region` changed, and stays open for `hold_frames`
+    further frames so a car that stops at the barrier is still read. `region`
+    is (x1, y1, x2, y2) as fractions of the frame; None means the whole frame.
+    """
+
+    def __init__(self, region=None, scale_width=160, threshold=0.01, pixel_delta=25,
+                 hold_frames=10, background_rate=0.05):
+        self.region = region
+        self.scale_width = scale_width
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.hold_frames = hold_frames
+        self.background_rate = background_rate
+        self._background = None
+        self._hold = 0
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self.gate_seconds = 0.0
+        self.inference_seconds = 0.0
+        self.inference_runs = 0
+
+    @classmethod
+    def from_config(cls, config, camera_id=None):
+        """Build a gate from system_config.json's "motion_gate" section, or None if disabled."""
+        options = dict(config.get("motion_gate", {}))
+        if not options.pop("enabled", True):
+            return None
+        regions = options.pop("regions", {})
+        region = regions.get(str(camera_id)) if camera_id is not None else None
+        # A typo in the config should not keep the camera from starting
+        known = set(inspect.signature(cls.__init__).parameters) - {'self', 'region'}
+        unknown = sorted(set(options) - known)
+        if unknown:
+            print(f"Ignoring unknown motion_gate options: {', '.join(unknown)}")
+            options = {key: value for key, value in options.items() if key in known}
+        return cls(region=tuple(region) if region else None, **options)
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if self.region is not None:
+            x1, y1, x2, y2 = self.region
+            frame = frame[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+            height, width = frame.shape[:2]
+        scale = self.scale_width / float(max(width, 1))
+        small = cv2.resize(frame, (self.scale_width, max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0).astype("float32")
+
+    def should_process(self, frame, force=False):
+        """True if the region changed (or force is set); updates the background either way."""
+        start = time.perf_counter()
+        self.frames_seen += 1
+        small = self._prepare(frame)
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small
+            changed = 1.0
+        else:
+            diff = cv2.absdiff(small, self._background)
+            changed = float((diff > self.pixel_delta).mean())
+            cv2.accumulateWeighted(small, self._background, self.background_rate)
+        self.gate_seconds += time.perf_counter() - start
+
+        if changed >= self.threshold:
+            self._hold = self.hold_frames
+        elif self._hold > 0:
+            self._hold -= 1
+        elif not force:
+            self.frames_skipped += 1
+            return False
+        return True
+
+    def record_inference(self, seconds):
+        """Tell the gate how long one detection pass took, to estimate the time saved."""
+        self.inference_seconds += seconds
+        self.inference_runs += 1
+
+    def stats(self):
+        """Skip counters; cpu_seconds_saved is skipped frames x average detection time, minus the gate's own cost."""
+        average = self.inference_seconds / self.inference_runs if self.inference_runs else 0.0
+        saved = self.frames_skipped * average - self.gate_seconds
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_skipped': self.frames_skipped,
+            'skip_rate': round(self.frames_skipped / self.frames_seen, 3) if self.frames_seen else 0.0,
+            'avg_inference_ms': round(average * 1000, 1),
+            'gate_ms': round(self.gate_seconds * 1000, 1),
+            'cpu_seconds_saved': round(max(saved, 0.0), 2),
+        }
@@ -0,0 +1,165 @@
+#ocr_strategy.py
+#BuiltWithLove by @papitx0
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+import numpy as np
+
+
+class OCRStrategy:
+    """Runs OCR preprocessing variants on a plate crop, best-yielding first.
+
+    Each variant is a (name, preprocess) pair. Variants are tried in order of
+    their historical hit rate and the run stops as soon as `accept(text,
+    confidence)` approves a read. run_batch() reads every crop of a frame
+    through the reader's batched recognition path, one call per variant. With
+    workers > 0 the first variant runs inline and, for crops it did not settle,
+    the rest are evaluated concurrently on a thread pool; whatever has not
+    started yet is cancelled once every crop has an accepted read.
+    """
+
+    def __init__(self, reader, variants, accept, workers=0, min_length=4):
+        self.reader = reader
+        self.variants = list(variants)
+        self.accept = accept
+        self.workers = workers
+        self.min_length = min_length
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+        self._lock = threading.Lock()
+        self._stats = {name: {'attempts': 0, 'accepted': 0, 'best': 0, 'seconds': 0.0}
+                       for name, _ in self.variants}
+
+    def ordered_variants(self):
+        """Variants sorted by hit rate (ties keep the configured order)."""
+        with self._lock:
+            def hit_rate(variant):
+                stats = self._stats[variant[0]]
+                return (stats['accepted'] + 1) / (stats['attempts'] + 2)
+            return sorted(self.variants, key=hit_rate, reverse=True)
+
+    def _best(self, name, reads):
+        """(name, text, confidence, accepted) for the most confident long-enough read of one image."""
+        best_text, best_confidence = "", 0
+        for (bbox, text, confidence) in reads:
+            if confidence > best_confidence and len(text.strip()) >= self.min_length:
+                best_text = text.strip()
+                best_confidence = confidence
+        accepted = bool(best_text) and self.accept(best_text, best_confidence)
+        return name, best_text, best_confidence, accepted
+
+    def _record(self, name, results, seconds):
+        with self._lock:
+            stats = self._stats[name]
+            stats['attempts'] += len(results)
+            stats['seconds'] += seconds
+            stats['accepted'] += sum(1 for result in results if result[3])
+
+    def _read(self, variant, plate_image):
+        name, preprocess = variant
+        start = time.perf_counter()
+        result = self._best(name, self.reader.readtext(preprocess(plate_image)))
+        self._record(name, [result], time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    def _letterbox(images):
+        """Scale crops to a common height (keeping their aspect ratio) and pad them to a common width."""
+        height = max(image.shape[0] for image in images)
+        scaled = []
+        for image in images:
+            if image.shape[0] != height:
+                width = max(int(round(image.shape[1] * height / image.shape[0])), 1)
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+            scaled.append(image)
+        width = max(image.shape[1] for image in scaled)
+        padded = []
+        for image in scaled:
+            pad = width - image.shape[1]
+            if pad:
+                # Centre the plate on its own background shade so the padding reads as blank plate
+                padding = [(0, 0), (pad // 2, pad - pad // 2)] + [(0, 0)] * (image.ndim - 2)
+                image = np.pad(image, padding, mode='constant', constant_values=int(np.median(image)))
+            padded.append(image)
+        return padded, height, width
+
+    def _read_batch(self, variant, plate_images):
+        """One variant over several crops in a single batched reader call."""
+        name, preprocess = variant
+        if len(plate_images) == 1 or not hasattr(self.reader, 'readtext_batched'):
+            return [self._read(variant, image) for image in plate_images]
+        start = time.perf_counter()
+        # readtext_batched resizes every image to one size; letterbox first so no plate gets stretched
+        images, height, width = self._letterbox([preprocess(image) for image in plate_images])
+        batched = self.reader.readtext_batched(images, n_width=width, n_height=height, batch_size=len(images))
+        results = [self._best(name, reads) for reads in batched]
+        self._record(name, results, time.perf_counter() - start)
+        return results
+
+    def _pick(self, results):
+        # Prefer accepted reads, then the highest confidence
+        name, text, confidence, _ = max(results, key=lambda result: (result[3], result[2]))
+        if text:
+            with self._lock:
+                self._stats[name]['best'] += 1
+        return text, confidence
+
+    def run(self, plate_image, max_variants=None):
+        """Return (text, confidence) of the best read, stopping at the first accepted one.
+
+        max_variants=1 runs only the best-yielding variant (single pass).
+        """
+        return self.run_batch([plate_image], max_variants=max_variants)[0]
+
+    def run_batch(self, plate_images, max_variants=None):
+        """run() over all crops of a frame: one batched reader call per variant, not per crop.
+
+        Later variants only re-read the crops no earlier variant got an
+        accepted read for. Returns [(text, confidence), ...] in input order.
+        """
+        order = self.ordered_variants()[:max_variants]
+        results = [[] for _ in plate_images]
+
+        def collect(indices, reads):
+            for index, result in zip(indices, reads):
+                results[index].append(result)
+            return [index for index, result in zip(indices, reads) if not result[3]]
+
+        remaining = collect(range(len(plate_images)), self._read_batch(order[0], plate_images))
+        if remaining and len(order) > 1:
+            if self._pool is None:
+                for variant in order[1:]:
+                    remaining = collect(remaining, self._read_batch(variant, [plate_images[i] for i in remaining]))
+                    if not remaining:
+                        break
+            else:
+                images = [plate_images[index] for index in remaining]
+                unsettled = set(remaining)
+                pending = {self._pool.submit(self._read_batch, variant, images) for variant in order[1:]}
+                while pending and unsettled:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unsettled.difference_update(set(remaining) - set(collect(remaining, future.result())))
+                for future in pending:
+                    future.cancel()
+
+        return [self._pick(reads) for reads in results]
+
+    def stats(self):
+        """Per-variant counters: attempts, accepted reads, times it gave the final read, hit rate, avg ms."""
+        with self._lock:
+            report = {}
+            for name, stats in self._stats.items():
+                attempts = stats['attempts']
+                report[name] = {
+                    'attempts': attempts,
+                    'accepted': stats['accepted'],
+                    'best': stats['best'],
+                    'hit_rate': round(stats['accepted'] / attempts, 3) if attempts else 0.0,
+                    'avg_ms': round(stats['seconds'] * 1000 / attempts, 1) if attempts else 0.0,
+                }
+            return report
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,202 @@
+#plate_tracker.py
+#BuiltWithLove by @papitx0
+from collections import Counter, deque
+
+
+class PlateConsensus:
+    """Character-position voting over the OCR reads of one vehicle.
+
+    Reads are weighted by OCR confidence. The winning length is voted first,
+    then each character position among reads of that length, so one O/0 or B/8
+    slip is outvoted by the other frames.
+    """
+
+    def __init__(self, max_reads=20):
+        self.reads = deque(maxlen=max_reads)  # (cleaned text, raw text, confidence)
+
+    def add(self, text, raw_text, confidence):
+        self.reads.append((text, raw_text, confidence))
+
+    def result(self):
+        """(text, raw_text, confidence, agreement, supporting reads), or None without reads."""
+        if not self.reads:
+            return None
+        lengths = Counter()
+        for text, _, confidence in self.reads:
+            lengths[len(text)] += confidence
+        length = lengths.most_common(1)[0][0]
+        same_length = [read for read in self.reads if len(read[0]) == length]
+
+        positions = [Counter() for _ in range(length)]
+        for text, _, confidence in same_length:
+            for index, char in enumerate(text):
+                positions[index][char] += confidence
+        text = ""
+        agreement = 1.0
+        for votes in positions:
+            char, weight = votes.most_common(1)[0]
+            text += char
+            agreement = min(agreement, weight / sum(votes.values()))
+
+        matching = [read for read in same_length if read[0] == text]
+        raw_text = max(matching, key=lambda read: read[2])[1] if matching else text
+        confidence = sum(read[2] for read in same_length) / len(same_length)
+        return text, raw_text, confidence, agreement, len(same_length)
+
+
+class PlateTrack:
+    """One plate followed across frames."""
+
+    def __init__(self, track_id, bbox, confidence, frame_index):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.detection_confidence = confidence
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.hits = 1
+        self.plate_number = None  # best accepted read so far
+        self.ocr_confidence = 0.0
+        self.raw_text = ""
+        self.ocr_attempts = 0
+        self.last_ocr_frame = None
+        self.confirmed = False  # True once the consensus read is stable
+        self.consensus = PlateConsensus()
+
+    @property
+    def centroid(self):
+        x1, y1, x2, y2 = self.bbox
+        return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+class PlateTracker:
+    """IoU/centroid tracker for plate boxes so each vehicle is OCR'd once, not every frame.
+
+    update() matches the boxes of a frame to existing tracks (highest IoU first,
+    then nearest centroid for small fast-moving boxes) and returns a track per
+    box. Every OCR read of a track is a vote; the track is confirmed once
+    `min_reads` reads agree on each character by at least `min_agreement` of the
+    vote and the result passes `validate`. After that it is only re-verified
+    every `reverify_every` frames. Tracks not seen for `max_missed` frames are
+    dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=1.0, max_missed=15, reverify_every=30,
+                 min_reads=3, min_agreement=0.6, min_read_confidence=0.2, validate=None):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance  # in box diagonals
+        self.max_missed = max_missed
+        self.reverify_every = reverify_every
+        self.min_reads = min_reads
+        self.min_agreement = min_agreement
+        self.min_read_confidence = min_read_confidence
+        self.validate = validate
+        self.tracks = {}
+        self.frame_index = 0
+        self._next_id = 1
+        self.ocr_calls = 0
+        self.ocr_skipped = 0
+
+    @staticmethod
+    def iou(a, b):
+        ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+        ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+        inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+        if inter == 0:
+            return 0.0
+        area_a = (a[2] - a[0]) * (a[3] - a[1])
+        area_b = (b[2] - b[0]) * (b[3] - b[1])
+        return inter / float(area_a + area_b - inter)
+
+    @staticmethod
+    def _centroid_distance(track, bbox):
+        cx, cy = track.centroid
+        bx, by = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+        diagonal = max(((bbox[2] - bbox[0]) ** 2 + (bbox[3] - bbox[1]) ** 2) ** 0.5, 1.0)
+        return (((cx - bx) ** 2 + (cy - by) ** 2) ** 0.5) / diagonal
+
+    def update(self, plates):
+        """Assign a track to each plate ({'bbox', 'confidence'}); returns [(track, plate), ...]."""
+        self.frame_index += 1
+        unmatched_tracks = set(self.tracks)
+        unmatched_plates = set(range(len(plates)))
+        matches = {}
+
+        # Greedy IoU matching, best overlaps first
+        pairs = []
+        for track_id in unmatched_tracks:
+            for index in unmatched_plates:
+                overlap = self.iou(self.tracks[track_id].bbox, plates[index]['bbox'])
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, track_id, index))
+        for _, track_id, index in sorted(pairs, reverse=True):
+            if track_id in unmatched_tracks and index in unmatched_plates:
+                matches[index] = track_id
+                unmatched_tracks.discard(track_id)
+                unmatched_plates.discard(index)
+
+        # Centroid fallback for boxes that moved too far to overlap
+        for index in sorted(unmatched_plates):
+            candidates = [(self._centroid_distance(self.tracks[track_id], plates[index]['bbox']), track_id)
+                          for track_id in unmatched_tracks]
+            candidates = [c for c in candidates if c[0] <= self.max_distance]
+            if candidates:
+                _, track_id = min(candidates)
+                matches[index] = track_id
+                unmatched_tracks.discard(track_id)
+
+        assigned = []
+        for index, plate in enumerate(plates):
+            track_id = matches.get(index)
+            if track_id is None:
+                track = PlateTrack(self._next_id, plate['bbox'], plate['confidence'], self.frame_index)
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+            else:
+                track = self.tracks[track_id]
+                track.bbox = plate['bbox']
+                track.detection_confidence = plate['confidence']
+                track.last_frame = self.frame_index
+                track.hits += 1
+            assigned.append((track, plate))
+
+        # Forget vehicles that left the scene
+        for track_id in list(self.tracks):
+            if self.frame_index - self.tracks[track_id].last_frame > self.max_missed:
+                del self.tracks[track_id]
+        return assigned
+
+    def has_pending(self):
+        """True while a vehicle in view has no agreed plate yet."""
+        return any(not track.confirmed and track.last_frame == self.frame_index
+                   for track in self.tracks.values())
+
+    def needs_ocr(self, track):
+        if not track.confirmed:
+            return True
+        return self.frame_index - track.last_ocr_frame >= self.reverify_every
+
+    def record_read(self, track, plate_number, raw_text, ocr_confidence):
+        """Add one OCR read (cleaned text) to a track's vote and re-evaluate its plate."""
+        self.ocr_calls += 1
+        track.ocr_attempts += 1
+        track.last_ocr_frame = self.frame_index
+        if len(plate_number) < 4 or ocr_confidence < self.min_read_confidence:
+            return
+        track.consensus.add(plate_number, raw_text, ocr_confidence)
+        text, raw, confidence, agreement, supporting = track.consensus.result()
+        stable = (supporting >= self.min_reads and agreement >= self.min_agreement and
+                  (self.validate is None or self.validate(text)))
+        if stable:
+            track.plate_number = text
+            track.raw_text = raw
+            track.ocr_confidence = confidence
+            track.confirmed = True
+
+    def stats(self):
+        return {
+            'frames': self.frame_index,
+            'active_tracks': len(self.tracks),
+            'tracks_created': self._next_id - 1,
+            'ocr_calls': self.ocr_calls,
+            'ocr_skipped': self.ocr_skipped,
+        }
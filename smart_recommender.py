@@ -3,7 +3,21 @@
 import datetime
 import os
 import pandas as pd
-import joblib
+
+MODEL_FILES = ("parking_data/spot_model.pkl", "parking_data/zone_encoder.pkl", "parking_data/spot_encoder.pkl")
+_models = {}  # cached (model, zone_encoder, spot_encoder), keyed by file mtimes
+
+
+def _load_models():
+    """Load the trained model once (joblib/sklearn are imported on first use); reload if retrained."""
+    key = tuple(os.path.getmtime(path) for path in MODEL_FILES)
+    if key not in _models:
+        import joblib
+        loaded = tuple(joblib.load(path) for path in MODEL_FILES)
+        _models.clear()
+        _models[key] = loaded
+    return _models[key]
+
 
 def recommend_best_spot(zone=None, available_df=None, current_time=None):
     if available_df is None or available_df.empty:
@@ -13,9 +27,7 @@ def recommend_best_spot(zone=None, available_df=None, current_time=None):
         current_time = datetime.datetime.now()
 
     try:
-        model = joblib.load("parking_data/spot_model.pkl")
-        zone_encoder = joblib.load("parking_data/zone_encoder.pkl")
-        spot_encoder = joblib.load("parking_data/spot_encoder.pkl")
+        model, zone_encoder, spot_encoder = _load_models()
     except FileNotFoundError:
         return None  # gracefully fail if AI model isn't trained yet
 
@@ -0,0 +1,216 @@
+#spot_table.py
+#BuiltWithLove by @papitx0
+import os
+import json
+import atexit
+import threading
+import time
+import pandas as pd
+from storage import SPOT_COLUMNS
+
+
+class SpotTable:
+    """Process-resident parking spot table with write-behind persistence.
+
+    While the app runs this table is the source of truth: reads and updates
+    are dictionary operations keyed by spot_id. Every update is appended to a
+    small change log so it survives a crash, and a background flusher writes
+    the whole table to the storage backend at most once per flush_interval.
+    On startup the last snapshot is loaded and any logged changes are replayed.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, storage, data_dir, flush_interval=2.0):
+        """Return the shared table for this data directory, loading it on first use."""
+        key = (storage.name, os.path.abspath(data_dir))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                table = cls(storage, data_dir, flush_interval)
+                table.load()
+                table.start()
+                cls._instances[key] = table
+            return cls._instances[key]
+
+    def __init__(self, storage, data_dir, flush_interval=2.0):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.change_log_file = os.path.join(data_dir, "parking_spots_changes.jsonl")
+        self.flushing_log_file = self.change_log_file + ".flushing"
+        self._rows = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._log = None
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._txn = None  # (spot_id, fields, previous values) of an open transaction
+        self.flush_count = 0
+
+    # ---- startup ----
+    def load(self):
+        with self._lock:
+            self._rows = {}
+            if self.storage.has_spots():
+                for row in self.storage.load_spots().to_dict('records'):
+                    self._rows[row['spot_id']] = row
+            # Replay changes that were logged but not flushed before the last shutdown
+            replayed = 0
+            for path in (self.flushing_log_file, self.change_log_file):
+                replayed += self._replay(path)
+            self._log = open(self.change_log_file, 'a', encoding='utf-8')
+            if replayed:
+                self._dirty = True
+        if replayed:
+            self.flush()
+
+    def _replay(self, path):
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    break  # torn final line from a crash
+                self._apply(change['spot_id'], change['fields'])
+                count += 1
+        return count
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ---- hot path ----
+    def _apply(self, spot_id, fields):
+        row = self._rows.get(spot_id)
+        if row is None:
+            return False
+        row.update(fields)
+        return True
+
+    def get(self, spot_id):
+        with self._lock:
+            row = self._rows.get(spot_id)
+            return dict(row) if row is not None else None
+
+    def update(self, spot_id, fields):
+        """Update one spot in memory and record the change; persistence happens later."""
+        with self._lock:
+            row = self._rows.get(spot_id)
+            if row is None:
+                return False
+            if self._txn is not None:
+                self._txn.append((spot_id, dict(fields), {k: row.get(k) for k in fields}))
+                row.update(fields)
+                return True
+            row.update(fields)
+            self._write_log([{'spot_id': spot_id, 'fields': fields}])
+            return True
+
+    def _write_log(self, changes):
+        self._log.write("".join(json.dumps(c) + "\n" for c in changes))
+        self._log.flush()
+        self._dirty = True
+
+    def apply_changes(self, changes):
+        """Apply and log a batch of changes in one write (used to recover a commit)."""
+        with self._lock:
+            changes = [c for c in changes if self._apply(c['spot_id'], c['fields'])]
+            if changes:
+                self._write_log(changes)
+
+    # ---- transactions ----
+    def begin(self):
+        """Hold the table for one transaction; updates apply in memory with undo info."""
+        self._lock.acquire()
+        self._txn = []
+
+    def pending_changes(self):
+        return [{'spot_id': spot_id, 'fields': fields} for spot_id, fields, _ in self._txn or []]
+
+    def commit(self):
+        try:
+            changes = self.pending_changes()
+            if changes:
+                self._write_log(changes)
+        finally:
+            self._txn = None
+            self._lock.release()
+
+    def rollback(self):
+        try:
+            for spot_id, _, previous in reversed(self._txn or []):
+                self._rows[spot_id].update(previous)
+        finally:
+            self._txn = None
+            self._lock.release()
+
+    def to_frame(self):
+        with self._lock:
+            if not self._rows:
+                return pd.DataFrame(columns=SPOT_COLUMNS)
+            return pd.DataFrame([dict(row) for row in self._rows.values()])
+
+    def replace_all(self, spots_df):
+        """Replace every spot (used by initialization/reset) and persist immediately."""
+        with self._lock:
+            self._rows = {row['spot_id']: row for row in spots_df.to_dict('records')}
+            self._dirty = True
+        self.flush()
+
+    # ---- write-behind ----
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[SPOT FLUSH ERROR] {e}")
+
+    def flush(self):
+        """Write the current table to the backend if anything changed since the last flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                snapshot = pd.DataFrame([dict(row) for row in self._rows.values()], columns=SPOT_COLUMNS)
+                # Rotate the change log: entries after this point belong to the next flush
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._log.close()
+                if os.path.exists(self.flushing_log_file):
+                    # A previous flush failed; keep its entries ahead of the new ones
+                    with open(self.flushing_log_file, 'a', encoding='utf-8') as pending, \
+                            open(self.change_log_file, 'r', encoding='utf-8') as current:
+                        pending.write(current.read())
+                    os.remove(self.change_log_file)
+                else:
+                    os.replace(self.change_log_file, self.flushing_log_file)
+                self._log = open(self.change_log_file, 'a', encoding='utf-8')
+                self._dirty = False
+
+            try:
+                self.storage.save_spots(snapshot)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+            os.remove(self.flushing_log_file)
+            self.flush_count += 1
+            return True
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 1)
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._log is not None and not self._log.closed:
+                    self._log.close()
@@ -0,0 +1,842 @@
+#storage.py
+#BuiltWithLove by @papitx0
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import pandas as pd
+
+
+SPOT_COLUMNS = [
+    'spot_id', 'zone', 'status', 'plate_number', 'reserved_by', 'reserved_until', 'last_updated'
+]
+RESERVATION_COLUMNS = [
+    'id', 'spot_id', 'plate_number', 'customer_name',
+    'start_time', 'end_time', 'duration_minutes',
+    'detection_time', 'status', 'verification_code', 'created_at'
+]
+DETECTION_COLUMNS = [
+    'id', 'plate_number', 'confidence', 'detection_time',
+    'camera_location', 'is_emergency', 'processed'
+]
+QUEUE_COLUMNS = ["id", "plate_number", "name", "contact", "timestamp", "notified"]
+
+
+def normalize_plate(plate):
+    """Key used for plate lookups: trimmed and upper-cased, '' for missing values."""
+    if plate is None or (isinstance(plate, float) and plate != plate):
+        return ""
+    return str(plate).strip().upper()
+
+
+# ==== Append-only Reservation Journal ====
+class ReservationJournal:
+    """Reservation history kept as a snapshot CSV plus an append-only event journal.
+
+    Every create/update is one JSON line appended to the journal, so the write
+    cost does not depend on how many reservations exist. The journal is folded
+    back into the snapshot every `compact_every` events. Ids come from an
+    in-memory counter that is itself recorded in the journal after compaction.
+
+    Rows are indexed by normalized plate and by status; both indexes are
+    updated on every event so find() never scans the history.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, snapshot_file, journal_file, compact_every=500):
+        """Return the process-wide journal for these files so id allocation is shared."""
+        key = (os.path.abspath(snapshot_file), os.path.abspath(journal_file))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(snapshot_file, journal_file, compact_every)
+            return cls._instances[key]
+
+    def __init__(self, snapshot_file, journal_file, compact_every=500):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._rows = []
+        self._positions = {}  # id -> list of row positions (legacy files may repeat ids)
+        self._by_plate = {}  # normalized plate -> set of row positions
+        self._by_status = {}  # status -> set of row positions
+        self._next_id = 1
+        self._offset = 0
+        self._events_since_compaction = 0
+        self._loaded = False
+        self._pending = None  # events buffered by an open transaction
+
+    # ---- loading / replay ----
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+        else:
+            self._catch_up()
+
+    def _load(self):
+        self._rows = []
+        self._positions = {}
+        self._by_plate = {}
+        self._by_status = {}
+        self._next_id = 1
+        self._offset = 0
+        self._events_since_compaction = 0
+        if os.path.exists(self.snapshot_file):
+            try:
+                snapshot = pd.read_csv(self.snapshot_file)
+            except Exception:
+                snapshot = pd.DataFrame()
+            for row in snapshot.to_dict('records'):
+                self._add_row(row)
+        self._loaded = True
+        self._catch_up()
+
+    def _catch_up(self):
+        """Apply journal lines written since the last read (e.g. by another instance)."""
+        if not os.path.exists(self.journal_file):
+            if self._offset:
+                self._load()
+            return
+        size = os.path.getsize(self.journal_file)
+        if size < self._offset:
+            # Journal was compacted elsewhere; start again from the new snapshot
+            self._load()
+            return
+        if size == self._offset:
+            return
+        with open(self.journal_file, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only consume complete lines; a half-written tail is picked up next time
+        consumed = data.rfind(b'\n') + 1
+        for line in data[:consumed].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # torn line left by a crash mid-append
+            self._apply(event)
+        self._offset += consumed
+
+    def _add_row(self, row):
+        row_id = row.get('id')
+        try:
+            row_id = int(row_id)
+            row['id'] = row_id
+            self._next_id = max(self._next_id, row_id + 1)
+        except (TypeError, ValueError):
+            pass
+        self._positions.setdefault(row_id, []).append(len(self._rows))
+        self._rows.append(row)
+        self._index(len(self._rows) - 1)
+
+    @staticmethod
+    def _status_key(status):
+        return status if isinstance(status, str) else ""
+
+    def _index(self, position):
+        row = self._rows[position]
+        self._by_plate.setdefault(normalize_plate(row.get('plate_number')), set()).add(position)
+        self._by_status.setdefault(self._status_key(row.get('status')), set()).add(position)
+
+    def _unindex(self, position):
+        row = self._rows[position]
+        self._by_plate.get(normalize_plate(row.get('plate_number')), set()).discard(position)
+        self._by_status.get(self._status_key(row.get('status')), set()).discard(position)
+
+    def _apply(self, event):
+        op = event.get('op')
+        if op == 'create':
+            self._add_row(dict(event['row']))
+        elif op == 'update':
+            reindex = 'plate_number' in event['fields'] or 'status' in event['fields']
+            for position in self._positions.get(event['id'], []):
+                if reindex:
+                    self._unindex(position)
+                self._rows[position].update(event['fields'])
+                if reindex:
+                    self._index(position)
+        elif op == 'clear':
+            self._rows = []
+            self._positions = {}
+            self._by_plate = {}
+            self._by_status = {}
+        elif op == 'seq':
+            self._next_id = max(self._next_id, event['next_id'])
+        self._events_since_compaction += 1
+
+    # ---- writing ----
+    @staticmethod
+    def _json_default(value):
+        if hasattr(value, 'item'):
+            return value.item()
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def _append(self, events):
+        """Write events to the journal in one append and apply them in memory."""
+        lines = [json.dumps(e, default=self._json_default) for e in events]
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        with open(self.journal_file, 'ab') as f:
+            if f.seek(0, os.SEEK_END) > self._offset:
+                # Terminate a torn line from a crash so it cannot swallow this event
+                payload = b"\n" + payload
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+        for line in lines:
+            # Apply the decoded form so memory matches what a replay would build
+            self._apply(json.loads(line))
+        if self._events_since_compaction >= self.compact_every:
+            self.compact()
+
+    def _record(self, event):
+        if self._pending is not None:
+            self._pending.append(event)
+        else:
+            self._append([event])
+
+    def create(self, row):
+        with self._lock:
+            self._ensure_loaded()
+            row = dict(row)
+            row['id'] = self._next_id
+            self._next_id += 1
+            self._record({'op': 'create', 'row': row})
+            return row['id']
+
+    def update(self, reservation_id, fields):
+        with self._lock:
+            self._ensure_loaded()
+            self._record({'op': 'update', 'id': int(reservation_id), 'fields': dict(fields)})
+
+    def clear(self):
+        with self._lock:
+            self._ensure_loaded()
+            self._record({'op': 'clear'})
+
+    # ---- transactions ----
+    def begin(self):
+        """Start buffering events; the journal stays locked until commit/rollback."""
+        self._lock.acquire()
+        self._ensure_loaded()
+        self._pending = []
+
+    def take_pending(self):
+        events, self._pending = self._pending or [], None
+        return events
+
+    def write_events(self, events):
+        """Append a committed batch in one write. Creates already on disk are skipped,
+        which makes replaying an interrupted commit safe."""
+        with self._lock:
+            self._ensure_loaded()
+            events = [json.loads(json.dumps(e, default=self._json_default)) for e in events]
+            events = [e for e in events if not (e['op'] == 'create' and e['row']['id'] in self._positions)]
+            if events:
+                self._append(events)
+
+    def end(self):
+        self._pending = None
+        self._lock.release()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot (temp file + rename) and truncate it."""
+        with self._lock:
+            self._ensure_loaded()
+            columns = RESERVATION_COLUMNS + [c for row in self._rows for c in row if c not in RESERVATION_COLUMNS]
+            snapshot = pd.DataFrame(self._rows, columns=list(dict.fromkeys(columns)))
+            tmp_file = self.snapshot_file + ".tmp"
+            snapshot.to_csv(tmp_file, index=False)
+            os.replace(tmp_file, self.snapshot_file)
+            # Keep the id counter monotonic even if the snapshot is now empty
+            seq_line = (json.dumps({'op': 'seq', 'next_id': self._next_id}) + "\n").encode('utf-8')
+            with open(self.journal_file, 'wb') as f:
+                f.write(seq_line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._offset = len(seq_line)
+            self._events_since_compaction = 0
+
+    # ---- reading ----
+    def get(self, reservation_id):
+        """Latest row stored under an id, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            positions = self._positions.get(reservation_id)
+            return dict(self._rows[positions[-1]]) if positions else None
+
+    def find(self, plate=None, status=None):
+        """Rows matching a plate and/or status, oldest first, via the hash indexes."""
+        with self._lock:
+            self._ensure_loaded()
+            candidates = []
+            if plate is not None:
+                candidates.append(self._by_plate.get(normalize_plate(plate), set()))
+            if status is not None:
+                candidates.append(self._by_status.get(status, set()))
+            if not candidates:
+                positions = range(len(self._rows))
+            else:
+                candidates.sort(key=len)
+                positions = sorted(p for p in candidates[0] if all(p in c for c in candidates[1:]))
+            matches = [dict(self._rows[p]) for p in positions]
+        if not matches:
+            return pd.DataFrame(columns=RESERVATION_COLUMNS)
+        return pd.DataFrame(matches)
+
+    def to_frame(self):
+        with self._lock:
+            self._ensure_loaded()
+            if not self._rows:
+                return pd.DataFrame(columns=RESERVATION_COLUMNS)
+            return pd.DataFrame([dict(row) for row in self._rows])
+
+
+# ==== CSV Backend (original file layout) ====
+class CSVStorage:
+    """Stores every table in its own CSV file inside data_dir."""
+
+    name = "csv"
+
+    def __init__(self, data_dir="parking_data"):
+        from detection_store import DetectionStore  # imports this module's column lists
+        self.data_dir = data_dir
+        self.parking_spots_file = os.path.join(data_dir, "parking_spots.csv")
+        self.reservations_file = os.path.join(data_dir, "reservations_history.csv")
+        self.anpr_detections_file = os.path.join(data_dir, "anpr_detections.csv")
+        self.queue_file = os.path.join(data_dir, "priority_queue.csv")
+        self.reservations_journal_file = os.path.join(data_dir, "reservations_journal.jsonl")
+        self.reservations = ReservationJournal.open(self.reservations_file, self.reservations_journal_file)
+        self.pending_commit_file = os.path.join(data_dir, "pending_commit.json")
+        self.detections = DetectionStore.open(data_dir)
+        self.sightings = self.detections.sightings
+        # Serializes read-modify-write cycles between threads of this process
+        self._lock = threading.RLock()
+        self._txn = None
+
+    def init_tables(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        if not os.path.exists(self.reservations_file):
+            pd.DataFrame(columns=[
+                'id', 'spot_id', 'plate_number', 'customer_name',
+                'start_time', 'end_time', 'duration_minutes',
+                'detection_time', 'status', 'created_at'
+            ]).to_csv(self.reservations_file, index=False)
+        if not os.path.exists(self.queue_file):
+            pd.DataFrame(columns=QUEUE_COLUMNS).to_csv(self.queue_file, index=False)
+
+    # ---- spots ----
+    def has_spots(self):
+        return os.path.exists(self.parking_spots_file)
+
+    def load_spots(self):
+        return pd.read_csv(self.parking_spots_file)
+
+    def save_spots(self, spots_df):
+        with self._lock:
+            tmp_file = self.parking_spots_file + ".tmp"
+            spots_df.to_csv(tmp_file, index=False)
+            os.replace(tmp_file, self.parking_spots_file)
+
+    def update_spot(self, spot_id, fields):
+        with self._lock:
+            df = pd.read_csv(self.parking_spots_file)
+            mask = df['spot_id'] == spot_id
+            for column, value in fields.items():
+                df.loc[mask, column] = value
+            df.to_csv(self.parking_spots_file, index=False)
+
+    # ---- reservations (snapshot + journal) ----
+    def load_reservations(self):
+        return self.reservations.to_frame()
+
+    def insert_reservation(self, row):
+        """Append a reservation create event and return the id it was stored under."""
+        return self.reservations.create(row)
+
+    def update_reservation(self, reservation_id, fields):
+        self.reservations.update(reservation_id, fields)
+
+    def get_reservation(self, reservation_id):
+        return self.reservations.get(reservation_id)
+
+    def find_reservations(self, plate=None, status=None):
+        return self.reservations.find(plate=plate, status=status)
+
+    def clear_reservations(self):
+        self.reservations.clear()
+        self.reservations.compact()
+
+    # ---- priority queue ----
+    def load_queue(self):
+        if self._txn is not None and self._txn['queue'] is not None:
+            return self._txn['queue'].copy()
+        return pd.read_csv(self.queue_file)
+
+    def _write_queue(self, df):
+        """Write the queue now, or keep it for the commit if a transaction is open."""
+        if self._txn is not None:
+            self._txn['queue'] = df
+            return
+        tmp_file = self.queue_file + ".tmp"
+        df.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, self.queue_file)
+
+    def insert_queue(self, row):
+        with self._lock:
+            df = self.load_queue()
+            row = dict(row)
+            row['id'] = len(df) + 1
+            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+            self._write_queue(df)
+            return row['id']
+
+    def claim_next_in_queue(self):
+        """Mark the oldest pending queue entry as notified and return it (or None)."""
+        with self._lock:
+            df = self.load_queue()
+            pending = df[df['notified'] == False]
+            if pending.empty:
+                return None
+            first = pending.iloc[0]
+            df.loc[pending.index[0], 'notified'] = True
+            self._write_queue(df)
+            return first
+
+    # ---- transactions ----
+    def begin(self):
+        """Open a unit of work. Reservation events and queue changes are buffered in
+        memory and this storage stays locked for other threads until commit/rollback."""
+        self._lock.acquire()
+        self.reservations.begin()
+        self._txn = {'queue': None}
+
+    def commit(self, spot_changes):
+        """Make the unit of work durable with a single temp-file + rename.
+
+        pending_commit.json is the commit point: once it exists the transaction
+        is committed, and its parts are applied to the journal and queue file.
+        The caller applies spot_changes and then calls finish_commit().
+        """
+        try:
+            queue_df = self._txn['queue']
+            record = {
+                'reservation_events': self.reservations.take_pending(),
+                'queue_rows': queue_df.to_dict('records') if queue_df is not None else None,
+                'spot_changes': spot_changes,
+            }
+            self._txn = None
+            if not (record['reservation_events'] or record['queue_rows'] is not None or spot_changes):
+                return
+            tmp_file = self.pending_commit_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(record, f, default=ReservationJournal._json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.pending_commit_file)
+            self._apply_commit(record)
+        finally:
+            self._txn = None
+            self.reservations.end()
+            self._lock.release()
+
+    def rollback(self):
+        self._txn = None
+        self.reservations.end()
+        self._lock.release()
+
+    def _apply_commit(self, record):
+        self.reservations.write_events(record['reservation_events'])
+        if record['queue_rows'] is not None:
+            self._write_queue(pd.DataFrame(record['queue_rows']))
+
+    def recover_commit(self):
+        """Re-apply a commit interrupted by a crash; returns its spot changes."""
+        if not os.path.exists(self.pending_commit_file):
+            return []
+        try:
+            with open(self.pending_commit_file, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except ValueError:
+            return []
+        with self._lock:
+            self._apply_commit(record)
+        return record.get('spot_changes', [])
+
+    def finish_commit(self):
+        if os.path.exists(self.pending_commit_file):
+            os.remove(self.pending_commit_file)
+
+    # ---- ANPR detections ----
+    def load_detections(self, since=None, until=None):
+        return self.detections.read(since=since, until=until)
+
+    def insert_detections(self, rows):
+        """Buffer detection rows for the daily segment files (see DetectionStore)."""
+        self.detections.append(rows)
+
+    def flush_detections(self):
+        """Write buffered detection rows to disk now."""
+        self.detections.flush()
+
+
+# ==== SQLite Backend (WAL) ====
+class SQLiteStorage:
+    """Embedded SQLite database in WAL mode with indexed tables.
+
+    WAL lets the dashboard keep reading while the ANPR thread writes, and every
+    mutation touches a single row instead of rewriting a whole file.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS parking_spots (
+            spot_id TEXT PRIMARY KEY,
+            zone TEXT,
+            status TEXT,
+            plate_number TEXT,
+            reserved_by TEXT,
+            reserved_until TEXT,
+            last_updated TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_spots_status ON parking_spots(status);
+
+        CREATE TABLE IF NOT EXISTS reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spot_id TEXT,
+            plate_number TEXT,
+            plate_key TEXT,
+            customer_name TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            duration_minutes,
+            detection_time TEXT,
+            status TEXT,
+            verification_code TEXT,
+            created_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_reservations_plate_status ON reservations(plate_key, status);
+        CREATE INDEX IF NOT EXISTS idx_reservations_status_end ON reservations(status, end_time);
+        CREATE INDEX IF NOT EXISTS idx_reservations_spot ON reservations(spot_id);
+
+        CREATE TABLE IF NOT EXISTS anpr_detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plate_number TEXT,
+            plate_key TEXT,
+            confidence REAL,
+            detection_time TEXT,
+            camera_location TEXT,
+            is_emergency INTEGER,
+            processed INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_detections_plate_time ON anpr_detections(plate_key, detection_time);
+        CREATE INDEX IF NOT EXISTS idx_detections_time ON anpr_detections(detection_time);
+
+        CREATE TABLE IF NOT EXISTS priority_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plate_number TEXT,
+            name TEXT,
+            contact TEXT,
+            timestamp TEXT,
+            notified INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_queue_notified ON priority_queue(notified, id);
+    """
+
+    def __init__(self, data_dir="parking_data", db_file="smartpark.db"):
+        from detection_store import RecentSightings  # imports this module's column lists
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, db_file)
+        self.conn = None
+        self.sightings = RecentSightings.open(data_dir)
+        self._lock = threading.RLock()
+
+    def init_tables(self, auto_import=True):
+        os.makedirs(self.data_dir, exist_ok=True)
+        is_new = not os.path.exists(self.db_path)
+        # isolation_level=None -> autocommit; multi-statement work uses explicit BEGIN
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        if is_new and auto_import:
+            # First start on this backend: pull in whatever the CSV backend left behind
+            self.import_csv(self.data_dir)
+
+    def _query_df(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    @contextmanager
+    def _atomic(self):
+        """Run a block in its own transaction, or as a savepoint inside an open one."""
+        with self._lock:
+            if self.conn.in_transaction:
+                self.conn.execute("SAVEPOINT atomic_block")
+                try:
+                    yield
+                except Exception:
+                    self.conn.execute("ROLLBACK TO atomic_block")
+                    self.conn.execute("RELEASE atomic_block")
+                    raise
+                self.conn.execute("RELEASE atomic_block")
+            else:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                self.conn.execute("COMMIT")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params)
+
+    @staticmethod
+    def _plate_key(plate):
+        return normalize_plate(plate)
+
+    @staticmethod
+    def _clean(value):
+        """Convert pandas/numpy scalars into values sqlite3 can bind."""
+        if value is None:
+            return None
+        try:
+            if pd.isna(value):
+                return None
+        except (TypeError, ValueError):
+            pass
+        if hasattr(value, "item"):
+            return value.item()
+        return value
+
+    def _insert(self, table, row, columns):
+        cols = [c for c in columns if c in row and c != 'id']
+        sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        cursor = self._execute(sql, [self._clean(row[c]) for c in cols])
+        return cursor.lastrowid
+
+    def _update(self, table, key_column, key, fields, columns):
+        cols = [c for c in fields if c in columns and c != key_column]
+        if not cols:
+            return
+        assignments = ", ".join(f"{c} = ?" for c in cols)
+        self._execute(f"UPDATE {table} SET {assignments} WHERE {key_column} = ?",
+                      [self._clean(fields[c]) for c in cols] + [self._clean(key)])
+
+    # ---- spots ----
+    def has_spots(self):
+        return self._execute("SELECT 1 FROM parking_spots LIMIT 1").fetchone() is not None
+
+    def load_spots(self):
+        return self._query_df(f"SELECT {', '.join(SPOT_COLUMNS)} FROM parking_spots ORDER BY rowid")
+
+    def save_spots(self, spots_df):
+        rows = [[self._clean(row.get(c)) for c in SPOT_COLUMNS] for row in spots_df.to_dict('records')]
+        with self._atomic():
+            self.conn.execute("DELETE FROM parking_spots")
+            self.conn.executemany(
+                f"INSERT INTO parking_spots ({', '.join(SPOT_COLUMNS)}) VALUES ({', '.join('?' * len(SPOT_COLUMNS))})",
+                rows)
+
+    def update_spot(self, spot_id, fields):
+        self._update("parking_spots", "spot_id", spot_id, fields, SPOT_COLUMNS)
+
+    # ---- reservations ----
+    def load_reservations(self):
+        return self._query_df(f"SELECT {', '.join(RESERVATION_COLUMNS)} FROM reservations ORDER BY id")
+
+    def insert_reservation(self, row):
+        row = dict(row)
+        row['plate_key'] = self._plate_key(row.get('plate_number'))
+        return self._insert("reservations", row, RESERVATION_COLUMNS + ['plate_key'])
+
+    def update_reservation(self, reservation_id, fields):
+        fields = dict(fields)
+        if 'plate_number' in fields:
+            fields['plate_key'] = self._plate_key(fields['plate_number'])
+        self._update("reservations", "id", reservation_id, fields, RESERVATION_COLUMNS + ['plate_key'])
+
+    def get_reservation(self, reservation_id):
+        df = self._query_df(f"SELECT {', '.join(RESERVATION_COLUMNS)} FROM reservations WHERE id = ?",
+                            (reservation_id,))
+        return df.iloc[0].to_dict() if not df.empty else None
+
+    def find_reservations(self, plate=None, status=None):
+        """Indexed lookup on (plate_key, status)."""
+        conditions, params = [], []
+        if plate is not None:
+            conditions.append("plate_key = ?")
+            params.append(normalize_plate(plate))
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query_df(f"SELECT {', '.join(RESERVATION_COLUMNS)} FROM reservations {where} ORDER BY id", params)
+
+    def clear_reservations(self):
+        self._execute("DELETE FROM reservations")
+
+    # ---- priority queue ----
+    def load_queue(self):
+        df = self._query_df(f"SELECT {', '.join(QUEUE_COLUMNS)} FROM priority_queue ORDER BY id")
+        df['notified'] = df['notified'].astype(bool)
+        return df
+
+    def insert_queue(self, row):
+        return self._insert("priority_queue", row, QUEUE_COLUMNS)
+
+    def claim_next_in_queue(self):
+        with self._atomic():
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(QUEUE_COLUMNS)} FROM priority_queue WHERE notified = 0 ORDER BY id LIMIT 1",
+                self.conn)
+            if df.empty:
+                return None
+            first = df.iloc[0]
+            self.conn.execute("UPDATE priority_queue SET notified = 1 WHERE id = ?", (int(first['id']),))
+            return first
+
+    # ---- ANPR detections ----
+    def load_detections(self, since=None, until=None):
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("detection_time >= ?")
+            params.append(str(since))
+        if until is not None:
+            # A bare date as upper bound covers that whole day
+            conditions.append("detection_time <= ?" if isinstance(until, datetime) else "substr(detection_time, 1, 10) <= ?")
+            params.append(str(until))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        df = self._query_df(f"SELECT {', '.join(DETECTION_COLUMNS)} FROM anpr_detections {where} ORDER BY id", params)
+        df['is_emergency'] = df['is_emergency'].astype(bool)
+        df['processed'] = df['processed'].astype(bool)
+        return df
+
+    def insert_detections(self, rows):
+        with self._atomic():
+            for row in rows:
+                row = dict(row)
+                row['plate_key'] = self._plate_key(row.get('plate_number'))
+                self._insert("anpr_detections", row, DETECTION_COLUMNS + ['plate_key'])
+        self.sightings.record_rows(rows)
+
+    def flush_detections(self):
+        pass  # rows are committed by insert_detections
+
+    # ---- transactions ----
+    def begin(self):
+        """Open one DB transaction; this connection stays locked until commit/rollback."""
+        self._lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._lock.release()
+            raise
+
+    def commit(self, spot_changes):
+        """Write the spot changes into the same transaction and commit everything at once."""
+        try:
+            for change in spot_changes:
+                self.update_spot(change['spot_id'], change['fields'])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._lock.release()
+
+    def rollback(self):
+        try:
+            self.conn.execute("ROLLBACK")
+        finally:
+            self._lock.release()
+
+    def recover_commit(self):
+        # A SQLite commit is atomic on its own; there is never anything to replay
+        return []
+
+    def finish_commit(self):
+        pass
+
+    # ---- one-shot CSV import ----
+    def import_csv(self, data_dir="parking_data"):
+        """Copy the legacy parking_data/*.csv files into empty SQLite tables.
+
+        Tables that already contain rows are left alone, so running this twice
+        never duplicates data. Returns a dict of imported row counts per table.
+        """
+        legacy = CSVStorage(data_dir)
+        sources = [
+            ("parking_spots", legacy.parking_spots_file, legacy.load_spots, SPOT_COLUMNS),
+            ("reservations", legacy.reservations_file, legacy.load_reservations, RESERVATION_COLUMNS),
+            ("anpr_detections", None, legacy.load_detections, DETECTION_COLUMNS),  # legacy file + segments
+            ("priority_queue", legacy.queue_file, legacy.load_queue, QUEUE_COLUMNS),
+        ]
+        imported = {}
+        with self._lock:
+            for table, csv_path, load, columns in sources:
+                if csv_path is not None and not os.path.exists(csv_path):
+                    continue
+                if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None:
+                    continue
+                try:
+                    df = load()
+                except Exception:
+                    continue
+                if df.empty:
+                    continue
+
+                df = df.reindex(columns=columns)
+                if table in ("reservations", "anpr_detections"):
+                    df['plate_key'] = df['plate_number'].astype(str).str.strip().str.upper()
+                if table == "parking_spots":
+                    df = df.drop_duplicates(subset=['spot_id'], keep='last')
+                else:
+                    # Legacy ids were len(df) + 1 and can repeat; let SQLite renumber them
+                    df = df.drop(columns=['id'])
+
+                rows = [[self._clean(v) for v in row] for row in df.itertuples(index=False)]
+                cols = list(df.columns)
+                with self._atomic():
+                    self.conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", rows)
+                imported[table] = len(rows)
+        return imported
+
+
+STORAGE_BACKENDS = {
+    "csv": CSVStorage,
+    "sqlite": SQLiteStorage,
+}
+
+
+def open_storage(backend="csv", data_dir="parking_data"):
+    """Create and initialize the storage backend registered under `backend`."""
+    try:
+        storage_cls = STORAGE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(STORAGE_BACKENDS)}")
+    storage = storage_cls(data_dir)
+    storage.init_tables()
+    return storage
+
+
+if __name__ == "__main__":
+    # One-shot migration: python storage.py [data_dir]
+    import sys
+
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "parking_data"
+    sqlite_storage = SQLiteStorage(target_dir)
+    sqlite_storage.init_tables(auto_import=False)
+    counts = sqlite_storage.import_csv(target_dir)
+    print(f"✅ Imported into {sqlite_storage.db_path}: {counts or 'nothing new'}")
@@ -0,0 +1,208 @@
+#video_batch.py
+#BuiltWithLove by @papitx0
+"""Headless, parallel ANPR over long video files.
+
+    python video_batch.py footage.mp4 [--workers 4] [--chunk-seconds 120]
+
+The video is split into time ranges that a process pool works through, each
+worker seeking to its own range. Every finished range is checkpointed, so an
+interrupted job picks up where it stopped when run again; the merged
+detections (in frame order) go to the detection store once the last range is done.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import pandas as pd
+
+_anpr = None  # one ANPRSystem per pool process
+
+
+def plan_chunks(video_path, chunk_seconds=120):
+    """(fps, [(index, start_frame, end_frame), ...]) covering the whole video in chunk_seconds ranges.
+
+    The frame count in the header is only an estimate, so the last chunk runs to the end of the file (end_frame None).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video file: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+    if total <= 0:
+        raise ValueError(f"Cannot read the frame count of {video_path}, so it cannot be split into chunks")
+    size = max(int(chunk_seconds * fps), 1)
+    chunks = [[index, start, start + size] for index, start in enumerate(range(0, total, size))]
+    chunks[-1][2] = None
+    return fps, [tuple(chunk) for chunk in chunks]
+
+
+def _init_worker(anpr_options, threads):
+    # Split the cores between pool processes instead of letting each one use all of them
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    cv2.setNumThreads(threads)
+    global _anpr
+    from integrated_anpr_parking import ANPRSystem
+    _anpr = ANPRSystem(**anpr_options)
+
+
+def _process_chunk(video_path, chunk, checkpoint_path):
+    index, start_frame, end_frame = chunk
+    started = time.time()
+    detections = _anpr.process_video(video_path, save_detections=False, display=False,
+                                     start_frame=start_frame, end_frame=end_frame)
+    rows = [{key: value for key, value in detection.items() if key != 'plate_image'} for detection in detections]
+    # Write then rename, so a crash never leaves a half-written checkpoint behind
+    with open(checkpoint_path + ".tmp", 'w') as f:
+        json.dump({'chunk': list(chunk), 'seconds': round(time.time() - started, 1), 'detections': rows}, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+    return index, len(rows)
+
+
+class VideoBatchJob:
+    """One video split into checkpointed chunks under parking_data/video_jobs/<name>_<id>/."""
+
+    def __init__(self, video_path, workers=None, chunk_seconds=120, data_folder="parking_data",
+                 boundary_seconds=2.0, anpr_options=None):
+        self.video_path = os.path.abspath(video_path)
+        self.workers = workers or max(os.cpu_count() // 2, 1)
+        self.chunk_seconds = chunk_seconds
+        self.boundary_seconds = boundary_seconds
+        self.anpr_options = anpr_options or {'confidence_threshold': 0.6, 'ocr_confidence_threshold': 0.5}
+        stat = os.stat(self.video_path)
+        # Same file and chunking -> same job directory, which is what makes resuming work
+        key = f"{self.video_path}|{stat.st_size}|{int(stat.st_mtime)}|{chunk_seconds}"
+        name = os.path.splitext(os.path.basename(self.video_path))[0]
+        self.job_dir = os.path.join(data_folder, "video_jobs", f"{name}_{hashlib.sha1(key.encode()).hexdigest()[:8]}")
+        self.job_file = os.path.join(self.job_dir, "job.json")
+        self.data_folder = data_folder
+        os.makedirs(self.job_dir, exist_ok=True)
+
+    def _checkpoint(self, index):
+        return os.path.join(self.job_dir, f"chunk_{index:05d}.json")
+
+    def _load_job(self):
+        if os.path.exists(self.job_file):
+            with open(self.job_file, 'r') as f:
+                return json.load(f)
+        fps, chunks = plan_chunks(self.video_path, self.chunk_seconds)
+        job = {'video': self.video_path, 'fps': fps, 'chunks': chunks, 'saved': False}
+        self._save_job(job)
+        return job
+
+    def _save_job(self, job):
+        with open(self.job_file + ".tmp", 'w') as f:
+            json.dump(job, f, indent=2)
+        os.replace(self.job_file + ".tmp", self.job_file)
+
+    def pending_chunks(self, job):
+        return [tuple(chunk) for chunk in job['chunks'] if not os.path.exists(self._checkpoint(chunk[0]))]
+
+    def run(self):
+        """Process every chunk not checkpointed yet, then merge; returns the merged detections."""
+        job = self._load_job()
+        pending = self.pending_chunks(job)
+        total = len(job['chunks'])
+        if pending:
+            print(f"{len(pending)} of {total} chunks to process with {self.workers} workers "
+                  f"(checkpoints in {self.job_dir})")
+            threads = max((os.cpu_count() or 1) // self.workers, 1)
+            context = multiprocessing.get_context("spawn")
+            started = time.time()
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(self.anpr_options, threads)) as pool:
+                futures = [pool.submit(_process_chunk, self.video_path, chunk, self._checkpoint(chunk[0]))
+                           for chunk in pending]
+                for done, future in enumerate(as_completed(futures), 1):
+                    index, found = future.result()
+                    print(f"  chunk {index + 1}/{total} done ({found} detections) - "
+                          f"{done}/{len(pending)} in {time.time() - started:.0f}s")
+        return self.merge(job)
+
+    def merge(self, job=None):
+        """All checkpointed detections in frame order, with vehicles split across a chunk boundary reported once."""
+        job = job or self._load_job()
+        merged = []
+        previous_tail = set()  # plates read in the last boundary_seconds of the previous chunk
+        for index, start_frame, end_frame in job['chunks']:
+            path = self._checkpoint(index)
+            if not os.path.exists(path):
+                previous_tail = set()
+                continue
+            with open(path, 'r') as f:
+                detections = sorted(json.load(f)['detections'], key=lambda detection: detection['frame'])
+            chunk_start = start_frame / job['fps']
+            chunk_end = end_frame / job['fps'] if end_frame is not None else float('inf')
+            for detection in detections:
+                # The tracker restarts in every chunk; don't report a car twice just because it straddles the cut
+                if detection['plate_number'] in previous_tail and \
+                        detection['video_time'] - chunk_start <= self.boundary_seconds:
+                    continue
+                merged.append(detection)
+            previous_tail = {detection['plate_number'] for detection in detections
+                             if chunk_end - detection['video_time'] <= self.boundary_seconds}
+        return merged
+
+    def save(self, detections):
+        """Write the merged detections to the job folder and, once per job, to the detection store."""
+        job = self._load_job()
+        pd.DataFrame(detections).to_csv(os.path.join(self.job_dir, "detections.csv"), index=False)
+        if job.get('saved') or self.pending_chunks(job):
+            return False
+        from storage import open_storage
+        # Same backend the web app reads, so batch results show up there
+        storage = open_storage(os.getenv("SMARTPARK_STORAGE", "csv"), self.data_folder)
+        storage.insert_detections([{
+            'plate_number': detection['plate_number'],
+            'confidence': detection['confidence'],
+            'detection_time': detection['detection_time'],
+            'camera_location': os.path.basename(self.video_path),
+            'is_emergency': detection['is_emergency'],
+            'processed': False
+        } for detection in detections])
+        storage.flush_detections()
+        job['saved'] = True
+        self._save_job(job)
+        return True
+
+
+def process_video_parallel(video_path, workers=None, chunk_seconds=120, data_folder="parking_data",
+                           save_detections=True):
+    """Run (or resume) a chunked job for one video; returns the merged detections."""
+    job = VideoBatchJob(video_path, workers=workers, chunk_seconds=chunk_seconds, data_folder=data_folder)
+    detections = job.run()
+    if save_detections:
+        job.save(detections)
+    return detections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless parallel ANPR over a video file")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=None, help="pool processes (default: half the cores)")
+    parser.add_argument("--chunk-seconds", type=float, default=120)
+    parser.add_argument("--data-dir", default="parking_data")
+    parser.add_argument("--no-save", action="store_true", help="don't add the detections to the detection store")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.video):
+        print("Video file not found!")
+        return 1
+    started = time.time()
+    try:
+        detections = process_video_parallel(args.video, args.workers, args.chunk_seconds, args.data_dir,
+                                            save_detections=not args.no_save)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"Processed video with {len(detections)} total detections in {time.time() - started:.0f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
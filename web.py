@@ -5,14 +5,17 @@ import pandas as pd
 from datetime import datetime, timedelta
 import hashlib
 import os
+import json
 from smart_recommender import recommend_best_spot
 import re
 from notifier import notify_user
 import threading
 import time
-from integrated_anpr_parking import ANPRSystem
-import cv2
+from contextlib import contextmanager
 from admin import check_system_status, render_system_maintenance_message
+from storage import open_storage
+from spot_table import SpotTable
+from expiry_scheduler import ExpiryScheduler
 import random
 import string
 
@@ -20,7 +23,7 @@ import string
 
 # ==== Enhanced Database Class ====
 class ParkingDatabase:
-    def __init__(self, data_dir="parking_data"):
+    def __init__(self, data_dir="parking_data", backend=None):
         self.data_dir = data_dir
         self.parking_spots_file = os.path.join(data_dir, "parking_spots.csv")
         self.reservations_file = os.path.join(data_dir, "reservations_history.csv")
@@ -28,18 +31,30 @@ class ParkingDatabase:
         self.admin_users_file = os.path.join(data_dir, "admin_users.csv")
         self.anpr_detections_file = os.path.join(data_dir, "anpr_detections.csv")
         self.queue_file = os.path.join(data_dir, "priority_queue.csv")
+        # Storage backend: "csv" (default, original files) or "sqlite" (WAL database)
+        self.backend = backend or os.getenv("SMARTPARK_STORAGE", "csv")
+        self.storage = None
+        self.spots = None
+        self.expiry = None
+        self._txn_state = threading.local()
         self.init_database()
 
     def init_database(self):
         os.makedirs(self.data_dir, exist_ok=True)
-        if not os.path.exists(self.parking_spots_file):
+        self.storage = open_storage(self.backend, self.data_dir)
+        # In-memory spot table shared by every ParkingDatabase on this data_dir
+        self.spots = SpotTable.open(self.storage, self.data_dir)
+        # Finish a transaction that was committed but not fully applied before a crash
+        recovered_spot_changes = self.storage.recover_commit()
+        if recovered_spot_changes:
+            self.spots.apply_changes(recovered_spot_changes)
+        self.storage.finish_commit()
+        # Shared expiry service; start_expiry_scheduler() runs it in the background
+        self.expiry = ExpiryScheduler.open(self)
+        # Warm the last-seen index once per process with the past hour of detections
+        self.storage.sightings.seed(lambda: self.get_detections(since=datetime.now() - timedelta(hours=1)))
+        if self.spots.to_frame().empty:
             self.initialize_parking_spots()
-        if not os.path.exists(self.reservations_file):
-            pd.DataFrame(columns=[
-                'id', 'spot_id', 'plate_number', 'customer_name',
-                'start_time', 'end_time', 'duration_minutes',
-                'detection_time', 'status', 'created_at'
-            ]).to_csv(self.reservations_file, index=False)
         if not os.path.exists(self.emergency_vehicles_file):
             pd.DataFrame([{
                 "plate_number": "AMB001", "vehicle_type": "Ambulance",
@@ -52,14 +67,6 @@ class ParkingDatabase:
                 "username": "admin", "password_hash": hash_, "email": "admin@smartpark.com",
                 "role": "super_admin", "created_at": datetime.now().isoformat(), "last_login": ""
             }]).to_csv(self.admin_users_file, index=False)
-        if not os.path.exists(self.anpr_detections_file):
-            pd.DataFrame(columns=[
-                'id', 'plate_number', 'confidence', 'detection_time',
-                'camera_location', 'is_emergency', 'processed'
-            ]).to_csv(self.anpr_detections_file, index=False)
-        if not os.path.exists(self.queue_file):
-            pd.DataFrame(columns=["id", "plate_number", "name", "contact", "timestamp", "notified"]) \
-                .to_csv(self.queue_file, index=False)
 
     def initialize_parking_spots(self):
         zones = {"B": "ZONE B", "A": "ZONE A", "S": "ZONE S", "E": "ZONE E"}
@@ -73,17 +80,86 @@ class ParkingDatabase:
                     "plate_number": "", "reserved_by": "", "reserved_until": "",
                     "last_updated": datetime.now().isoformat()
                 })
-        pd.DataFrame(spots).to_csv(self.parking_spots_file, index=False)
+        self.spots.replace_all(pd.DataFrame(spots))
 
     def get_parking_spots(self):
-        return pd.read_csv(self.parking_spots_file)
+        return self.spots.to_frame()
+
+    @contextmanager
+    def transaction(self):
+        """Group spot, reservation and queue changes into one atomic commit.
+
+        Usage::
+
+            with db.transaction():
+                db.update_reservation(...)
+                db.update_spot_status(...)
+
+        Nothing is written until the block exits; an exception rolls every
+        change back. Nested calls join the outer transaction.
+        """
+        if getattr(self._txn_state, 'depth', 0):
+            self._txn_state.depth += 1
+            try:
+                yield self
+            finally:
+                self._txn_state.depth -= 1
+            return
+
+        self.spots.begin()
+        try:
+            self.storage.begin()
+        except Exception:
+            self.spots.rollback()
+            raise
+        self._txn_state.depth = 1
+        try:
+            yield self
+        except BaseException:
+            self._txn_state.depth = 0
+            self.storage.rollback()
+            self.spots.rollback()
+            raise
+        self._txn_state.depth = 0
+        try:
+            self.storage.commit(self.spots.pending_changes())
+        except Exception:
+            self.spots.rollback()
+            raise
+        self.spots.commit()
+        self.storage.finish_commit()
+
+    def get_spot(self, spot_id):
+        return self.spots.get(spot_id)
 
     def get_reservations_history(self):
         try:
-            return pd.read_csv(self.reservations_file)
+            return self.storage.load_reservations()
         except:
             return pd.DataFrame()
 
+    def insert_reservation(self, row):
+        """Store a fully-formed reservation row; the backend assigns its id."""
+        reservation_id = self.storage.insert_reservation(row)
+        if row.get('status') == 'active':
+            self.expiry.schedule(reservation_id, row.get('end_time'))
+        return reservation_id
+
+    def update_reservation(self, reservation_id, **fields):
+        self.storage.update_reservation(reservation_id, fields)
+        if fields.get('status') == 'active' and 'end_time' in fields:
+            self.expiry.schedule(reservation_id, fields['end_time'])
+
+    def get_reservation(self, reservation_id):
+        return self.storage.get_reservation(reservation_id)
+
+    def find_reservations(self, plate=None, status=None):
+        """Reservations for a plate and/or status, oldest first, via the store's index."""
+        return self.storage.find_reservations(plate=plate, status=status)
+
+    def clear_reservations(self):
+        self.storage.clear_reservations()
+
     def add_reservation(self, spot_id, plate_number, name, duration, contact=None):
         """Add a reservation and send a verification code if contact is provided."""
         from notifier import notify_user  # Ensure it's always available
@@ -106,34 +182,28 @@ class ParkingDatabase:
         # Generate a random 6-digit verification code
         verification_code = ''.join(random.choices(string.digits, k=6))
 
-        df = self.get_reservations_history()
-        new_id = len(df) + 1
-
-        new_row = pd.DataFrame([{
-            "id": new_id,
-            "spot_id": spot_id,
-            "plate_number": plate_number,
-            "customer_name": name,
-            "start_time": "",
-            "end_time": "",
-            "duration_minutes": duration,
-            "detection_time": "",
-            "status": "waiting_detection",
-            "verification_code": verification_code,
-            "created_at": datetime.now().isoformat()
-        }])
-
-        df = pd.concat([df, new_row])
-        df.to_csv(self.reservations_file, index=False)
-
-        # Update spot status
-        self.update_spot_status(
-            spot_id=spot_id,
-            status='reserved',
-            plate_number=plate_number,
-            reserved_by=name,
-            reserved_until=end.isoformat()
-        )
+        with self.transaction():
+            self.insert_reservation({
+                "spot_id": spot_id,
+                "plate_number": plate_number,
+                "customer_name": name,
+                "start_time": "",
+                "end_time": "",
+                "duration_minutes": duration,
+                "detection_time": "",
+                "status": "waiting_detection",
+                "verification_code": verification_code,
+                "created_at": datetime.now().isoformat()
+            })
+
+            # Update spot status
+            self.update_spot_status(
+                spot_id=spot_id,
+                status='reserved',
+                plate_number=plate_number,
+                reserved_by=name,
+                reserved_until=end.isoformat()
+            )
 
         # Optional: Send confirmation and verification code
         if contact:
@@ -158,14 +228,13 @@ class ParkingDatabase:
 
 
     def update_spot_status(self, spot_id, status, plate_number='', reserved_by='', reserved_until=''):
-        df = pd.read_csv(self.parking_spots_file)
-        mask = df['spot_id'] == spot_id
-        df.loc[mask, 'status'] = status
-        df.loc[mask, 'plate_number'] = plate_number
-        df.loc[mask, 'reserved_by'] = reserved_by
-        df.loc[mask, 'reserved_until'] = reserved_until
-        df.loc[mask, 'last_updated'] = datetime.now().isoformat()
-        df.to_csv(self.parking_spots_file, index=False)
+        self.spots.update(spot_id, {
+            'status': status,
+            'plate_number': plate_number,
+            'reserved_by': reserved_by,
+            'reserved_until': reserved_until,
+            'last_updated': datetime.now().isoformat()
+        })
 
     def process_anpr_detection(self, plate_number, confidence, is_emergency=False):
         """Process ANPR detection and update parking status"""
@@ -175,11 +244,7 @@ class ParkingDatabase:
         verification_code = ''.join(random.choices(string.digits, k=6))
 
         # Check for existing reservations
-        reservations_df = self.get_reservations_history()
-        waiting_reservation = reservations_df[
-            (reservations_df['plate_number'].str.upper() == plate_number.upper()) &
-            (reservations_df['status'] == 'waiting_detection')
-            ]
+        waiting_reservation = self.find_reservations(plate=plate_number, status='waiting_detection')
 
         if not waiting_reservation.empty:
             # Vehicle with reservation detected - activate reservation
@@ -194,23 +259,25 @@ class ParkingDatabase:
             else:
                 end_time = current_time + timedelta(minutes=int(duration))
 
-            # Update reservation status
-            reservations_df.loc[reservations_df['id'] == reservation_id, 'status'] = 'active'
-            reservations_df.loc[reservations_df['id'] == reservation_id, 'start_time'] = current_time.isoformat()
-            reservations_df.loc[reservations_df['id'] == reservation_id, 'end_time'] = end_time.isoformat()
-            reservations_df.loc[reservations_df['id'] == reservation_id, 'detection_time'] = current_time.isoformat()
-            reservations_df.loc[
-                reservations_df['id'] == reservation_id, 'verification_code'] = verification_code  # Add this line
-            reservations_df.to_csv(self.reservations_file, index=False)
+            # Update reservation and spot together
+            with self.transaction():
+                self.update_reservation(
+                    reservation_id,
+                    status='active',
+                    start_time=current_time.isoformat(),
+                    end_time=end_time.isoformat(),
+                    detection_time=current_time.isoformat(),
+                    verification_code=verification_code
+                )
 
-            # Update spot status to occupied
-            self.update_spot_status(
-                spot_id=spot_id,
-                status='occupied',
-                plate_number=plate_number,
-                reserved_by=reservation['customer_name'],
-                reserved_until=end_time.isoformat()
-            )
+                # Update spot status to occupied
+                self.update_spot_status(
+                    spot_id=spot_id,
+                    status='occupied',
+                    plate_number=plate_number,
+                    reserved_by=reservation['customer_name'],
+                    reserved_until=end_time.isoformat()
+                )
 
             return {
                 'action': 'reservation_activated',
@@ -230,34 +297,29 @@ class ParkingDatabase:
                 emergency_spot = available_spots.iloc[0]['spot_id']
 
                 # Create emergency reservation
-                df = self.get_reservations_history()
-                new_id = len(df) + 1
                 emergency_end = current_time + timedelta(hours=4)  # 4-hour emergency slot
 
-                new_row = pd.DataFrame([{
-                    "id": new_id,
-                    "spot_id": emergency_spot,
-                    "plate_number": plate_number,
-                    "customer_name": "EMERGENCY VEHICLE",
-                    "start_time": current_time.isoformat(),
-                    "end_time": emergency_end.isoformat(),
-                    "duration_minutes": 240,
-                    "detection_time": current_time.isoformat(),
-                    "status": "active",
-                    "created_at": current_time.isoformat()
-                }])
-
-                df = pd.concat([df, new_row])
-                df.to_csv(self.reservations_file, index=False)
-
-                # Update spot status
-                self.update_spot_status(
-                    spot_id=emergency_spot,
-                    status='occupied',
-                    plate_number=plate_number,
-                    reserved_by='EMERGENCY VEHICLE',
-                    reserved_until=emergency_end.isoformat()
-                )
+                with self.transaction():
+                    self.insert_reservation({
+                        "spot_id": emergency_spot,
+                        "plate_number": plate_number,
+                        "customer_name": "EMERGENCY VEHICLE",
+                        "start_time": current_time.isoformat(),
+                        "end_time": emergency_end.isoformat(),
+                        "duration_minutes": 240,
+                        "detection_time": current_time.isoformat(),
+                        "status": "active",
+                        "created_at": current_time.isoformat()
+                    })
+
+                    # Update spot status
+                    self.update_spot_status(
+                        spot_id=emergency_spot,
+                        status='occupied',
+                        plate_number=plate_number,
+                        reserved_by='EMERGENCY VEHICLE',
+                        reserved_until=emergency_end.isoformat()
+                    )
 
                 return {
                     'action': 'emergency_assigned',
@@ -274,187 +336,203 @@ class ParkingDatabase:
                 'message': f"Unknown vehicle {plate_number} detected. Please make a reservation or join the queue."
             }
 
-    def clean_expired_reservations(self):
-        now = datetime.now()
-        df = self.get_reservations_history()
-        spots_df = self.get_parking_spots()
-        updated = False
+    def start_expiry_scheduler(self):
+        """Run reservation expiry as a background service (safe to call on every rerun)."""
+        self.expiry.start()
 
-        for i, row in df.iterrows():
-            if row['status'] == 'active' and row['end_time']:
+    def clean_expired_reservations(self):
+        """One-off sweep over the active reservations; the scheduler normally does this."""
+        self.expiry.resync()
+        return self.expiry.run_due()
+
+    def expire_reservations(self, reservation_ids, now=None):
+        """Expire the given reservations if they are still active and past their end_time."""
+        now = now or datetime.now()
+        users_to_notify = []
+        expired = 0
+
+        # All expirations of one batch are committed in a single write
+        with self.transaction():
+            for reservation_id in reservation_ids:
+                row = self.get_reservation(reservation_id)
+                if row is None or row['status'] != 'active' or not row['end_time']:
+                    continue
                 try:
                     end_time = datetime.fromisoformat(row['end_time'])
-                    if end_time < now:
-                        # Mark reservation as expired
-                        df.at[i, 'status'] = 'expired'
-
-                        # Update spot status to available
-                        self.update_spot_status(
-                            spot_id=row['spot_id'],
-                            status='available',
-                            plate_number='',
-                            reserved_by='',
-                            reserved_until=''
-                        )
+                except (TypeError, ValueError):
+                    continue
+                if end_time >= now:
+                    continue
 
-                        # Notify next person in queue
-                        next_user = self.notify_next_user_in_queue()
-                        if next_user is not None:
-                            message = f"Good news! A parking spot is now available. Please proceed to make a reservation."
-                            notify_user(next_user['contact'], message)
+                # Mark reservation as expired
+                self.update_reservation(reservation_id, status='expired')
 
-                        updated = True
-                except:
-                    continue
+                # Update spot status to available
+                self.update_spot_status(
+                    spot_id=row['spot_id'],
+                    status='available',
+                    plate_number='',
+                    reserved_by='',
+                    reserved_until=''
+                )
+                expired += 1
 
-        if updated:
-            df.to_csv(self.reservations_file, index=False)
+                # Next person in queue is notified once the batch is committed
+                next_user = self.notify_next_user_in_queue()
+                if next_user is not None:
+                    users_to_notify.append(next_user)
+
+        for next_user in users_to_notify:
+            message = f"Good news! A parking spot is now available. Please proceed to make a reservation."
+            notify_user(next_user['contact'], message)
+        return expired
 
     def get_queue(self):
-        return pd.read_csv(self.queue_file)
+        return self.storage.load_queue()
 
     def add_to_queue(self, plate, name, contact):
-        df = self.get_queue()
-        new_id = len(df) + 1
-        new_entry = pd.DataFrame([{
-            "id": new_id,
+        self.storage.insert_queue({
             "plate_number": plate,
             "name": name,
             "contact": contact,
             "timestamp": datetime.now().isoformat(),
             "notified": False
-        }])
-        df = pd.concat([df, new_entry], ignore_index=True)
-        df.to_csv(self.queue_file, index=False)
+        })
 
     def notify_next_user_in_queue(self):
-        df = self.get_queue()
-        pending = df[df['notified'] == False]
-        if not pending.empty:
-            first = pending.iloc[0]
-            df.loc[pending.index[0], 'notified'] = True
-            df.to_csv(self.queue_file, index=False)
-            return first
-        return None
+        return self.storage.claim_next_in_queue()
+
+    def get_detections(self, since=None, until=None):
+        return self.storage.load_detections(since=since, until=until)
+
+    def last_seen(self, plate, within=None):
+        """Most recent ANPR sighting of a plate (in-memory, no disk access), or None."""
+        return self.storage.sightings.last_seen(plate, within=within)
+
+    def save_detections(self, detections, camera_location=''):
+        """Persist ANPR detections through the active storage backend."""
+        self.storage.insert_detections([{
+            'plate_number': detection['plate_number'],
+            'confidence': detection['confidence'],
+            'detection_time': detection['detection_time'],
+            'camera_location': detection.get('camera_location', camera_location),
+            'is_emergency': detection['is_emergency'],
+            'processed': False
+        } for detection in detections])
 
 
 # ==== ANPR Integration Class ====
 class ANPRParkingIntegration:
+    """Thin client of the ANPR worker process (anpr_worker.py), which owns the models and cameras.
+
+    Inference never runs in the web server; detections arrive over local IPC
+    and are applied to the parking database here.
+    """
+
     def __init__(self, db: ParkingDatabase):
         self.db = db
-        self.anpr_system = None
-        self.monitoring_active = False
-        self.monitoring_thread = None
+        from anpr_worker import WorkerClient
+        self.worker = WorkerClient(db.data_dir)
+        self.last_error = None
+        self._last_detection_time = {}
+        self._detection_lock = threading.Lock()
+        # Backlogged detections replayed after a restart are only recorded: the car may be long gone
+        self.worker.subscribe(self._handle_detections, on_stale=self._record_detections)
+
+    def _request(self, cmd, default=None, **args):
+        try:
+            result = self.worker.request(cmd, **args)
+            self.last_error = None
+            return result
+        except (ConnectionError, RuntimeError) as e:
+            self.last_error = str(e)
+            return default
 
     def initialize_anpr(self):
-        """Initialize ANPR system"""
-        try:
-            self.anpr_system = ANPRSystem(
-                confidence_threshold=0.6,
-                ocr_confidence_threshold=0.5
-            )
+        """Make sure the ANPR worker is running, starting it in the background if needed"""
+        if self.worker.spawn():
             return True
-        except Exception as e:
-            st.error(f"Failed to initialize ANPR system: {e}")
-            return False
-
-    def start_monitoring(self, camera_id=0):
-        """Start continuous ANPR monitoring in background"""
-        if not self.anpr_system:
-            if not self.initialize_anpr():
-                return False
-
-        self.monitoring_active = True
-        self.monitoring_thread = threading.Thread(
-            target=self._monitor_camera,
-            args=(camera_id,),
-            daemon=True
-        )
-        self.monitoring_thread.start()
-        return True
+        st.error(f"Failed to start the ANPR worker (see {os.path.join(self.db.data_dir, 'anpr_worker.log')})")
+        return False
 
-    def stop_monitoring(self):
-        """Stop ANPR monitoring"""
-        self.monitoring_active = False
-        if self.monitoring_thread:
-            self.monitoring_thread.join(timeout=5)
+    @property
+    def worker_running(self):
+        return self.worker.available()
 
-    def _monitor_camera(self, camera_id):
-        """Background camera monitoring function"""
-        cap = cv2.VideoCapture(camera_id)
-        if not cap.isOpened():
-            return
-
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-        frame_count = 0
-        last_detection_time = {}
-        detection_cooldown = 10  # 10 seconds between processing same plate
+    @property
+    def monitoring_active(self):
+        return any(camera['running'] for camera in self.camera_status())
 
+    def add_camera(self, camera_id, source, width=1280, height=720, target_fps=3.0):
+        """Register a camera (device index, RTSP URL or video file); the worker saves it to system_config.json"""
+        if not self.initialize_anpr():
+            return False
+        settings = {'width': width, 'height': height, 'target_fps': target_fps}
         try:
-            while self.monitoring_active:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                frame_count += 1
-                current_time = time.time()
-
-                # Process every 10th frame to reduce load
-                if frame_count % 10 == 0:
-                    # Save frame temporarily
-                    temp_frame_path = "temp_monitoring_frame.jpg"
-                    cv2.imwrite(temp_frame_path, frame)
+            self.worker.request("add_camera", camera_id=camera_id, source=source, settings=settings)
+        except RuntimeError as e:
+            raise ValueError(str(e))
+        return True
 
-                    # Process frame
-                    detections = self.anpr_system.process_image(temp_frame_path)
+    def remove_camera(self, camera_id):
+        self._request("remove_camera", camera_id=camera_id)
 
-                    # Process each detection
-                    for detection in detections:
-                        plate_number = detection['plate_number']
+    def start_monitoring(self, camera_id=0):
+        """Start continuous ANPR monitoring of a camera in the worker (device index if not registered)"""
+        if not self.initialize_anpr():
+            return False
 
-                        # Check cooldown period
-                        if (plate_number not in last_detection_time or
-                                current_time - last_detection_time[plate_number] > detection_cooldown):
-                            # Process the detection
-                            result = self.db.process_anpr_detection(
-                                plate_number=plate_number,
-                                confidence=detection['confidence'],
-                                is_emergency=detection['is_emergency']
-                            )
+        # Expiry runs as its own service rather than inside the frame loop
+        self.db.start_expiry_scheduler()
+        return bool(self._request("start", default=False, camera_id=camera_id))
 
-                            # Save detection to database
-                            self.anpr_system.save_detections([detection])
+    def stop_monitoring(self, camera_id=None):
+        """Stop ANPR monitoring of one camera, or of all of them"""
+        self._request("stop", camera_id=camera_id)
 
-                            # Update last detection time
-                            last_detection_time[plate_number] = current_time
+    def camera_status(self):
+        """Per-camera status from the worker ([] while it is not running)"""
+        return self._request("status", default=[])
 
-                            # Log the result
-                            print(f"ANPR Detection: {result['message']}")
+    def _handle_detections(self, camera_id, detections):
+        """Called from the inference pool with one frame's detections"""
+        detection_cooldown = 10  # 10 seconds between processing same plate
+        for detection in detections:
+            plate_number = detection['plate_number']
+            current_time = time.time()
+
+            # Check cooldown period (per camera)
+            with self._detection_lock:
+                key = (camera_id, plate_number)
+                last_time = self._last_detection_time.get(key)
+                if last_time is not None and current_time - last_time <= detection_cooldown:
+                    continue
+                # Update last detection time
+                self._last_detection_time[key] = current_time
 
-                    # Clean up temp file
-                    if os.path.exists(temp_frame_path):
-                        os.remove(temp_frame_path)
+            # Process the detection
+            result = self.db.process_anpr_detection(
+                plate_number=plate_number,
+                confidence=detection['confidence'],
+                is_emergency=detection['is_emergency']
+            )
 
-                # Clean expired reservations periodically
-                if frame_count % 300 == 0:  # Every ~30 seconds at 10 FPS processing
-                    self.db.clean_expired_reservations()
+            # Save detection to database
+            self.db.save_detections([detection], camera_location=str(camera_id))
 
-                time.sleep(0.1)  # Small delay to prevent excessive CPU usage
+            # Log the result
+            print(f"ANPR Detection: {result['message']}")
 
-        except Exception as e:
-            print(f"Error in camera monitoring: {e}")
-        finally:
-            cap.release()
+    def _record_detections(self, camera_id, detections):
+        """Keep late detections in the history without acting on them (no reservation or spot changes)"""
+        self.db.save_detections(detections, camera_location=str(camera_id))
 
     def process_single_image(self, image_path):
         """Process a single image for testing"""
-        if not self.anpr_system:
-            if not self.initialize_anpr():
-                return []
+        if not self.initialize_anpr():
+            return []
 
-        detections = self.anpr_system.process_image(image_path)
+        detections = self._request("process_image", default=[], path=os.path.abspath(image_path))
         results = []
 
         for detection in detections:
@@ -711,32 +789,26 @@ Your plate: {plate.upper()}"""
             end_time = start_time + timedelta(minutes=duration) if duration != 525600 else start_time + timedelta(
                 days=3650)
 
-            df = db.get_reservations_history()
-            new_id = len(df) + 1
+            with db.transaction():
+                db.insert_reservation({
+                    "spot_id": spot,
+                    "plate_number": plate.upper(),
+                    "customer_name": name,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "duration_minutes": duration,
+                    "detection_time": start_time.isoformat(),
+                    "status": "active",
+                    "created_at": start_time.isoformat()
+                })
 
-            new_row = pd.DataFrame([{
-                "id": new_id,
-                "spot_id": spot,
-                "plate_number": plate.upper(),
-                "customer_name": name,
-                "start_time": start_time.isoformat(),
-                "end_time": end_time.isoformat(),
-                "duration_minutes": duration,
-                "detection_time": start_time.isoformat(),
-                "status": "active",
-                "created_at": start_time.isoformat()
-            }])
-
-            df = pd.concat([df, new_row])
-            df.to_csv(db.reservations_file, index=False)
-
-            db.update_spot_status(
-                spot_id=spot,
-                status="occupied",
-                plate_number=plate.upper(),
-                reserved_by=name,
-                reserved_until=end_time.isoformat()
-            )
+                db.update_spot_status(
+                    spot_id=spot,
+                    status="occupied",
+                    plate_number=plate.upper(),
+                    reserved_by=name,
+                    reserved_until=end_time.isoformat()
+                )
 
             # Optional verification code generation
             if username_manual.strip():
@@ -874,40 +946,84 @@ def render_anpr_dashboard(db, anpr_integration):
     with col1:
         st.subheader("🔴 Live Monitoring")
 
-        if 'monitoring_active' not in st.session_state:
-            st.session_state.monitoring_active = False
-
-        if not st.session_state.monitoring_active:
-            camera_id = st.selectbox("Select Camera", [0, 1, 2], index=0)
-            if st.button("🎬 Start Live Monitoring"):
-                if anpr_integration.start_monitoring(camera_id):
-                    st.session_state.monitoring_active = True
-                    st.success("✅ ANPR monitoring started!")
+        if not anpr_integration.worker_running:
+            st.info("⚙️ The ANPR worker is not running (start it with `python anpr_worker.py`, or here).")
+            if st.button("▶️ Start ANPR Worker"):
+                if anpr_integration.initialize_anpr():
                     st.rerun()
+
+        cameras = anpr_integration.camera_status()
+        if anpr_integration.worker_running and not cameras:
+            st.info("No cameras registered yet")
+
+        for camera in cameras:
+            camera_id = camera['camera_id']
+            state = "🔴 Active" if camera['running'] else "⚪ Stopped"
+            with st.expander(f"📷 {camera_id} · {state}", expanded=camera['running']):
+                st.caption(f"Source: {camera['source']} · target {camera['target_fps']} fps · "
+                           f"{camera['frames_processed']} frames processed · {camera['detections']} detections")
+                if camera['error']:
+                    st.warning(camera['error'])
+                if camera['running']:
+                    if 'gate' in camera:
+                        gate_stats = camera['gate']
+                        st.caption(f"💤 Idle frames skipped: {gate_stats['frames_skipped']}/{gate_stats['frames_seen']} "
+                                   f"({gate_stats['skip_rate']:.0%}) · ~{gate_stats['cpu_seconds_saved']}s inference saved")
+                    if camera['latency_ms'] is not None:
+                        capture_stats = camera['capture']
+                        st.caption(f"⏱️ Capture to decision: {camera['latency_ms']} ms · "
+                                   f"stale frames dropped: {capture_stats['dropped']}/{capture_stats['captured']}")
+                    if 'sampling' in camera:
+                        sampler_stats = camera['sampling']
+                        st.caption(f"🎞️ Sampling {sampler_stats['effective_fps']} of {sampler_stats['source_fps']} fps "
+                                   f"(target {sampler_stats['target_fps']}, every {sampler_stats['interval_ms']:.0f} ms, "
+                                   f"pipeline {sampler_stats['latency_ms']:.0f} ms/frame)")
+                    if st.button("⏹️ Stop Monitoring", key=f"stop_{camera_id}"):
+                        anpr_integration.stop_monitoring(camera_id)
+                        st.success("⏸️ Monitoring stopped")
+                        st.rerun()
                 else:
-                    st.error("❌ Failed to start monitoring")
-        else:
-            st.success("🔴 ANPR Monitoring Active")
-            if st.button("⏹️ Stop Monitoring"):
-                anpr_integration.stop_monitoring()
-                st.session_state.monitoring_active = False
-                st.success("⏸️ Monitoring stopped")
-                st.rerun()
+                    start_col, remove_col = st.columns(2)
+                    if start_col.button("🎬 Start Live Monitoring", key=f"start_{camera_id}"):
+                        if anpr_integration.start_monitoring(camera_id):
+                            st.success("✅ ANPR monitoring started!")
+                            st.rerun()
+                        else:
+                            st.error("❌ Failed to start monitoring")
+                    if remove_col.button("🗑️ Remove", key=f"remove_{camera_id}"):
+                        anpr_integration.remove_camera(camera_id)
+                        st.rerun()
+
+        with st.form("add_camera_form"):
+            st.write("➕ **Add Camera**")
+            new_camera_id = st.text_input("Camera Name", placeholder="e.g., entrance")
+            new_source = st.text_input("Source", placeholder="Device index (0), RTSP URL or video file")
+            new_target_fps = st.number_input("Target FPS", min_value=0.5, max_value=30.0, value=3.0, step=0.5)
+            if st.form_submit_button("Add Camera"):
+                if not new_camera_id.strip() or not new_source.strip():
+                    st.error("Camera name and source are required")
+                else:
+                    try:
+                        anpr_integration.add_camera(new_camera_id.strip(), new_source.strip(),
+                                                    target_fps=new_target_fps)
+                        st.success(f"✅ Camera {new_camera_id.strip()} added")
+                        st.rerun()
+                    except ValueError as e:
+                        st.error(str(e))
 
     with col2:
         st.subheader("📊 Recent ANPR Detections")
 
-        # Show recent detections
-        if os.path.exists(db.anpr_detections_file):
-            detections_df = pd.read_csv(db.anpr_detections_file)
-            if not detections_df.empty:
-                recent_detections = detections_df.tail(5)
-                for _, detection in recent_detections.iterrows():
-                    with st.container():
-                        emergency_icon = "🚨" if detection.get('is_emergency', False) else "🚗"
-                        st.write(f"{emergency_icon} **{detection['plate_number']}** "
-                                 f"(Confidence: {detection['confidence']:.2f}) "
-                                 f"- {detection['detection_time']}")
+        # Show recent detections (only the last day's segments are read)
+        detections_df = db.get_detections(since=datetime.now() - timedelta(days=1))
+        if not detections_df.empty:
+            recent_detections = detections_df.tail(5)
+            for _, detection in recent_detections.iterrows():
+                with st.container():
+                    emergency_icon = "🚨" if detection.get('is_emergency', False) else "🚗"
+                    st.write(f"{emergency_icon} **{detection['plate_number']}** "
+                             f"(Confidence: {detection['confidence']:.2f}) "
+                             f"- {detection['detection_time']}")
         else:
             st.info("No detections yet")
 